@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import Conversation, Message
+from .models import Conversation, ConversationMember, Message
+
+class ConversationMemberInline(admin.TabularInline):
+    model = ConversationMember
+    extra = 0
+    readonly_fields = ('last_read_message_id', 'unread_count')
 
 class MessageInline(admin.TabularInline):
     model = Message
     extra = 0
-    readonly_fields = ('sender', 'content', 'created_at', 'is_read')
+    readonly_fields = ('sender', 'content', 'created_at')
     can_delete = False
     
     def has_add_permission(self, request, obj=None):
@@ -16,7 +21,7 @@ class ConversationAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'updated_at')
     search_fields = ('participants__username',)
     readonly_fields = ('created_at', 'updated_at')
-    inlines = [MessageInline]
+    inlines = [ConversationMemberInline, MessageInline]
     
     def get_participants(self, obj):
         return ", ".join([user.username for user in obj.participants.all()])
@@ -24,8 +29,8 @@ class ConversationAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('sender', 'short_content', 'conversation', 'created_at', 'is_read')
-    list_filter = ('is_read', 'created_at', 'sender')
+    list_display = ('sender', 'short_content', 'conversation', 'created_at')
+    list_filter = ('created_at', 'sender')
     search_fields = ('content', 'sender__username')
     readonly_fields = ('created_at',)
     
@@ -0,0 +1,110 @@
+"""
+Pub/sub hub for live chat events.
+
+Events are published per conversation and delivered to every WebSocket
+subscribed to it. Delivery goes through the broker named by CHAT_BROKER:
+LocalBroker keeps subscribers in this process, which covers a single
+server process. Running several processes needs a Broker subclass backed
+by a shared service (Redis pub/sub, Postgres LISTEN/NOTIFY) that calls the
+local callbacks for events published anywhere.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Broker:
+    """Moves events from publishers to the callbacks subscribed to a channel"""
+
+    def publish(self, channel, event):
+        raise NotImplementedError
+
+    def subscribe(self, channel, callback):
+        raise NotImplementedError
+
+    def unsubscribe(self, channel, callback):
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """
+    Delivers events to callbacks registered in the same process.
+
+    Only for a single server process: a socket served by one worker never
+    sees events published by another, such as a message sent through an
+    AJAX request that another worker handled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, event):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(event)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(callback)
+
+    def unsubscribe(self, channel, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(channel)
+            if callbacks is not None:
+                callbacks.discard(callback)
+                if not callbacks:
+                    del self._subscribers[channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.CHAT_BROKER)()
+    return _broker
+
+
+def conversation_channel(conversation_id):
+    return f'chat.conversation.{conversation_id}'
+
+
+def publish(conversation_id, event):
+    """Send an event to everyone subscribed to a conversation"""
+    get_broker().publish(conversation_channel(conversation_id), event)
+
+
+class Subscription:
+    """
+    A conversation's events as an asyncio queue.
+
+    Must be created inside the event loop that reads it; events published
+    from request threads are handed over to that loop.
+    """
+
+    def __init__(self, conversation_id):
+        self.channel = conversation_channel(conversation_id)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        get_broker().subscribe(self.channel, self._deliver)
+
+    def _deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        except RuntimeError:
+            # The loop has shut down; the socket is gone
+            pass
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        get_broker().unsubscribe(self.channel, self._deliver)
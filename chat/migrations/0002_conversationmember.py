@@ -0,0 +1,74 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def populate_watermarks(apps, schema_editor):
+    """Derive each member's watermark and unread count from Message.is_read"""
+    ConversationMember = apps.get_model('chat', 'ConversationMember')
+    Message = apps.get_model('chat', 'Message')
+
+    members = []
+    for member in ConversationMember.objects.iterator():
+        incoming = Message.objects.filter(conversation_id=member.conversation_id).exclude(sender_id=member.user_id)
+        unread = incoming.filter(is_read=False)
+        first_unread = unread.aggregate(first=Min('id'))['first']
+        if first_unread is None:
+            latest = Message.objects.filter(conversation_id=member.conversation_id).aggregate(latest=Max('id'))['latest']
+            member.last_read_message_id = latest or 0
+        else:
+            member.last_read_message_id = first_unread - 1
+        # Everything from others above the watermark, as mark_read counts it,
+        # including read messages that came after the first unread one
+        member.unread_count = incoming.filter(id__gt=member.last_read_message_id).count()
+        members.append(member)
+    ConversationMember.objects.bulk_update(members, ['last_read_message_id', 'unread_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The through model takes over the existing M2M table as is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationMember',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='chat.conversation')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'chat_conversation_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='chat.ConversationMember', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationmember',
+            name='last_read_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationmember',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
+from . import hub
 
 class Conversation(models.Model):
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(User, through='ConversationMember', related_name='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -18,21 +21,80 @@ class Conversation(models.Model):
     class Meta:
         ordering = ['-updated_at']
 
+class ConversationMember(models.Model):
+    """A user's place in a conversation: how far they have read and how much is left"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    last_read_message_id = models.BigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        # Reuses the table Django created for the plain participants M2M
+        db_table = 'chat_conversation_participants'
+        unique_together = [('conversation', 'user')]
+    
+    def __str__(self):
+        return f"{self.user} in conversation {self.conversation_id}"
+    
+    @classmethod
+    def mark_read(cls, conversation_id, user_id, message_id):
+        """
+        Move a member's read watermark up to message_id.
+        
+        A single row write, skipped when the watermark is already there;
+        anything from others newer than message_id stays unread.
+        """
+        remaining = Message.objects.filter(
+            conversation_id=conversation_id, id__gt=message_id
+        ).exclude(sender_id=user_id).order_by().values('conversation_id').annotate(
+            total=Count('id')
+        ).values('total')
+        updated = cls.objects.filter(
+            conversation_id=conversation_id, user_id=user_id, last_read_message_id__lt=message_id
+        ).update(
+            last_read_message_id=message_id,
+            unread_count=Coalesce(Subquery(remaining), 0),
+        )
+        if updated:
+            # Read receipt for the other members' open sockets
+            transaction.on_commit(lambda: hub.publish(conversation_id, {
+                'type': 'read', 'user_id': user_id, 'message_id': message_id,
+            }))
+        return updated
+    
+    @classmethod
+    def record_message(cls, message):
+        """Count a new message as unread for everyone but its sender, who has read it"""
+        members = cls.objects.filter(conversation_id=message.conversation_id)
+        members.exclude(user_id=message.sender_id).update(unread_count=F('unread_count') + 1)
+        members.filter(user_id=message.sender_id, last_read_message_id__lt=message.id).update(
+            last_read_message_id=message.id, unread_count=0
+        )
+
 class Message(models.Model):
-    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    # Covered by message_conversation_idx
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages', db_index=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # History windows and "newer than" polls are id ranges within a conversation
+            models.Index(fields=['conversation', 'id'], name='message_conversation_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.content[:20]}..."
     
-    def mark_as_read(self):
-        """Mark message as read if it's not already"""
-        if not self.is_read:
-            self.is_read = True
-            self.save()
+    def as_dict(self):
+        """The JSON shape of a message shared by the AJAX endpoints and the WebSocket"""
+        return {
+            'id': self.id,
+            'sender': self.sender.username,
+            'content': self.content,
+            'timestamp': self.created_at.strftime('%b %d, %Y, %I:%M %p'),
+            'sender_id': self.sender_id,
+            'created_at': self.created_at.strftime('%b %d, %Y, %I:%M %p')
+        }
@@ -0,0 +1,67 @@
+"""
+Wake-ups for long-polling chat requests.
+
+Waiting requests are coroutines parked on an asyncio.Event per request, so
+an open chat holds no thread while it waits. publish() sets the events of
+every request waiting on the conversation as soon as a message is
+committed, so requests served by the same process answer immediately.
+
+Messages sent through another worker process cannot set those events.
+Waiters therefore also re-check the database every DB_CHECK_INTERVAL
+seconds with one indexed EXISTS, which bounds the delay for those
+messages without a shared cache or broker.
+"""
+import asyncio
+import threading
+
+from .models import Message
+
+DB_CHECK_INTERVAL = 5.0
+
+_lock = threading.Lock()
+# Conversation id -> set of (event loop, asyncio.Event) for waiting requests
+_waiters = {}
+
+
+def publish(conversation_id, message_id):
+    """Wake every request in this process waiting on the conversation"""
+    with _lock:
+        waiters = list(_waiters.get(conversation_id, ()))
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # The waiter's loop has shut down
+            pass
+
+
+async def wait_for_message(conversation_id, after_id, timeout):
+    """
+    Wait until a message newer than after_id exists or timeout seconds pass.
+    Returns True if there may be something new to fetch.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    waiter = (loop, asyncio.Event())
+    with _lock:
+        _waiters.setdefault(conversation_id, set()).add(waiter)
+    try:
+        while True:
+            # Registered before checking, so a publish in between is not lost
+            if await Message.objects.filter(conversation_id=conversation_id, id__gt=after_id).aexists():
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(waiter[1].wait(), min(remaining, DB_CHECK_INTERVAL))
+                return True
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with _lock:
+            waiters = _waiters.get(conversation_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del _waiters[conversation_id]
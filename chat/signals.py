@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from . import hub, notify
+from .models import ConversationMember, Message
+
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    if created:
+        ConversationMember.record_message(instance)
+
+@receiver(post_save, sender=Message)
+def wake_waiting_readers(sender, instance, created, **kwargs):
+    if created:
+        # Waiters query as soon as they wake, so only after the row is visible
+        transaction.on_commit(lambda: notify.publish(instance.conversation_id, instance.id))
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    if created:
+        event = {'type': 'message', 'message': instance.as_dict()}
+        transaction.on_commit(lambda: hub.publish(instance.conversation_id, event))
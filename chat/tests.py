@@ -0,0 +1,234 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from . import hub, notify, views
+from .hub import LocalBroker
+from .models import Conversation, ConversationMember, Message
+from .websocket import handle_client_event
+
+
+class InboxTests(TestCase):
+
+    def setUp(self):
+        self.reader = User.objects.create_user('reader', password='pw')
+        self.client.force_login(self.reader)
+
+    def start_conversation(self, username, minutes_ago):
+        other = User.objects.create_user(username, password='pw')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.reader, other)
+        Conversation.objects.filter(pk=conversation.pk).update(updated_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return conversation, other
+
+    def test_most_recent_first_with_unread_counts_and_last_message(self):
+        old, alice = self.start_conversation('alice', 30)
+        recent, bob = self.start_conversation('bob', 5)
+        read = Message.objects.create(conversation=old, sender=alice, content='Read already')
+        ConversationMember.mark_read(old.pk, self.reader.pk, read.pk)
+        Message.objects.create(conversation=old, sender=alice, content='Unread')
+        Message.objects.create(conversation=recent, sender=self.reader, content='My question')
+        Message.objects.create(conversation=recent, sender=bob, content='One')
+        Message.objects.create(conversation=recent, sender=bob, content='Two')
+
+        response = self.client.get(reverse('chat-inbox'))
+
+        conversations = response.context['conversations']
+        self.assertEqual([conversation.pk for conversation in conversations], [recent.pk, old.pk])
+        self.assertEqual([conversation.unread_count for conversation in conversations], [2, 1])
+        self.assertEqual([conversation.last_message.content for conversation in conversations], ['Two', 'Unread'])
+        self.assertEqual([conversation.other_user for conversation in conversations], [bob, alice])
+
+    def test_conversation_without_messages(self):
+        conversation, _ = self.start_conversation('alice', 5)
+        response = self.client.get(reverse('chat-inbox'))
+        [listed] = response.context['conversations']
+        self.assertEqual((listed.pk, listed.unread_count, listed.last_message), (conversation.pk, 0, None))
+        self.assertContains(response, 'No messages yet')
+
+
+class WatermarkTests(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender', password='pw')
+        self.reader = User.objects.create_user('reader', password='pw')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.sender, self.reader)
+
+    def member(self, user):
+        return ConversationMember.objects.get(conversation=self.conversation, user=user)
+
+    def send(self, user, content):
+        return Message.objects.create(conversation=self.conversation, sender=user, content=content)
+
+    def test_mark_read_keeps_newer_messages_unread(self):
+        first = self.send(self.sender, 'One')
+        self.send(self.sender, 'Two')
+        self.send(self.sender, 'Three')
+        self.assertEqual(self.member(self.reader).unread_count, 3)
+
+        self.assertEqual(ConversationMember.mark_read(self.conversation.pk, self.reader.pk, first.pk), 1)
+
+        member = self.member(self.reader)
+        self.assertEqual((member.last_read_message_id, member.unread_count), (first.pk, 2))
+
+    def test_mark_read_never_moves_back(self):
+        first = self.send(self.sender, 'One')
+        last = self.send(self.sender, 'Two')
+        ConversationMember.mark_read(self.conversation.pk, self.reader.pk, last.pk)
+
+        self.assertEqual(ConversationMember.mark_read(self.conversation.pk, self.reader.pk, first.pk), 0)
+        self.assertEqual(ConversationMember.mark_read(self.conversation.pk, self.reader.pk, last.pk), 0)
+        member = self.member(self.reader)
+        self.assertEqual((member.last_read_message_id, member.unread_count), (last.pk, 0))
+
+    def test_replying_reads_the_conversation(self):
+        self.send(self.sender, 'Hi')
+        reply = self.send(self.reader, 'Hello')
+        member = self.member(self.reader)
+        self.assertEqual((member.last_read_message_id, member.unread_count), (reply.pk, 0))
+        self.assertEqual(self.member(self.sender).unread_count, 1)
+
+
+@mock.patch.object(views, 'MESSAGES_PER_PAGE', 3)
+class OlderMessagesTests(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender', password='pw')
+        self.reader = User.objects.create_user('reader', password='pw')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.sender, self.reader)
+        self.ids = [
+            Message.objects.create(conversation=self.conversation, sender=self.sender, content=str(n)).pk
+            for n in range(5)
+        ]
+        other = Conversation.objects.create()
+        other.participants.add(self.sender, self.reader)
+        Message.objects.create(conversation=other, sender=self.sender, content='Elsewhere')
+        self.client.force_login(self.reader)
+
+    def older(self, before_id):
+        url = reverse('chat-older-messages', args=[self.conversation.pk, before_id])
+        return self.client.get(url)
+
+    def test_pages_backwards_oldest_first(self):
+        data = self.older(self.ids[-1]).json()
+        self.assertEqual([message['id'] for message in data['messages']], self.ids[1:4])
+        self.assertTrue(data['has_more'])
+
+        data = self.older(self.ids[1]).json()
+        self.assertEqual([message['id'] for message in data['messages']], self.ids[:1])
+        self.assertFalse(data['has_more'])
+
+    def test_window_ending_at_first_message_has_no_more(self):
+        data = self.older(self.ids[3]).json()
+        self.assertEqual([message['id'] for message in data['messages']], self.ids[:3])
+        self.assertFalse(data['has_more'])
+
+    def test_non_member_is_refused(self):
+        self.client.force_login(User.objects.create_user('stranger', password='pw'))
+        self.assertEqual(self.older(self.ids[-1]).status_code, 403)
+
+
+class LongPollTests(TransactionTestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender', password='pw')
+        self.reader = User.objects.create_user('reader', password='pw')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.sender, self.reader)
+
+    async def test_publish_wakes_waiter(self):
+        waiter = asyncio.create_task(notify.wait_for_message(self.conversation.pk, 0, 10))
+        await asyncio.sleep(0.1)
+        await Message.objects.acreate(conversation=self.conversation, sender=self.sender, content='Hi')
+        self.assertTrue(await asyncio.wait_for(waiter, 2))
+        self.assertEqual(notify._waiters, {})
+
+    async def test_message_from_other_process_found_by_db_check(self):
+        # bulk_create sends no signals, like a message saved by another worker
+        await sync_to_async(Message.objects.bulk_create)([
+            Message(conversation=self.conversation, sender=self.sender, content='Hi')
+        ])
+        self.assertTrue(await notify.wait_for_message(self.conversation.pk, 0, 10))
+
+    async def test_timeout(self):
+        self.assertFalse(await notify.wait_for_message(self.conversation.pk, 0, 0.2))
+
+
+class LocalBrokerTests(TestCase):
+
+    def test_publish_reaches_subscribers_of_channel_only(self):
+        broker = LocalBroker()
+        received = []
+        broker.subscribe('a', received.append)
+        broker.subscribe('b', lambda event: received.append(('b', event)))
+
+        broker.publish('a', {'type': 'typing'})
+
+        self.assertEqual(received, [{'type': 'typing'}])
+
+    def test_unsubscribe_stops_delivery(self):
+        broker = LocalBroker()
+        received = []
+        broker.subscribe('a', received.append)
+        broker.unsubscribe('a', received.append)
+
+        broker.publish('a', {'type': 'typing'})
+
+        self.assertEqual(received, [])
+        self.assertEqual(broker._subscribers, {})
+
+
+class HubTests(TestCase):
+
+    async def test_subscription_receives_conversation_events(self):
+        subscription = hub.Subscription(7)
+        other = hub.Subscription(8)
+        try:
+            # Publishers run in request threads, not on the event loop
+            await sync_to_async(hub.publish, thread_sensitive=False)(7, {'type': 'read', 'message_id': 3})
+            event = await asyncio.wait_for(subscription.get(), 1)
+            self.assertEqual(event, {'type': 'read', 'message_id': 3})
+            self.assertTrue(other.queue.empty())
+        finally:
+            subscription.close()
+            other.close()
+
+
+class WebSocketEventTests(TransactionTestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender', password='pw')
+        self.reader = User.objects.create_user('reader', password='pw')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.sender, self.reader)
+        self.message = Message.objects.create(conversation=self.conversation, sender=self.sender, content='Hi')
+
+    def watermark(self):
+        return ConversationMember.objects.get(conversation=self.conversation, user=self.reader).last_read_message_id
+
+    async def test_read_ignores_unknown_message(self):
+        text = json.dumps({'type': 'read', 'message_id': self.message.pk + 100})
+        await handle_client_event(text, self.conversation.pk, self.reader)
+        self.assertEqual(await sync_to_async(self.watermark)(), 0)
+
+    async def test_read_moves_watermark(self):
+        text = json.dumps({'type': 'read', 'message_id': self.message.pk})
+        await handle_client_event(text, self.conversation.pk, self.reader)
+        self.assertEqual(await sync_to_async(self.watermark)(), self.message.pk)
+
+    async def test_typing_is_published_to_the_conversation(self):
+        subscription = hub.Subscription(self.conversation.pk)
+        try:
+            await handle_client_event(json.dumps({'type': 'typing'}), self.conversation.pk, self.reader)
+            event = await asyncio.wait_for(subscription.get(), 1)
+            self.assertEqual(event, {'type': 'typing', 'user_id': self.reader.pk, 'username': 'reader'})
+        finally:
+            subscription.close()
@@ -7,5 +7,7 @@ urlpatterns = [
     path('start/<str:username>/', views.start_conversation, name='chat-start'),
     path('api/conversation/<int:conversation_id>/send/', views.send_message_ajax, name='chat-send-message-ajax'),
     path('api/conversation/<int:conversation_id>/messages/<int:last_message_id>/', views.get_new_messages_ajax, name='chat-get-new-messages'),
+    path('api/conversation/<int:conversation_id>/messages/before/<int:before_id>/', views.older_messages_ajax, name='chat-older-messages'),
+    path('api/conversation/<int:conversation_id>/wait/<int:last_message_id>/', views.wait_for_messages_ajax, name='chat-wait-for-messages'),
     path('api/unread-count/', views.unread_message_count, name='chat-unread-count'),
 ]
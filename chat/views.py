@@ -1,33 +1,55 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.http import JsonResponse
-from django.db.models import Q, Count
-from .models import Conversation, Message
+from django.db.models import F, OuterRef, Prefetch, Subquery, Sum
+from . import notify
+from .models import Conversation, ConversationMember, Message
 from django.utils import timezone
+from posts.pagination import decode_cursor, keyset_page
+
+INBOX_PAGE_SIZE = 20
+# Longest a long-polling request is held open, in seconds
+LONG_POLL_TIMEOUT = 25
+# Messages in the first load of a conversation and in each older page
+MESSAGES_PER_PAGE = 50
 
 @login_required
 def inbox(request):
-    """Show all conversations for the current user"""
-    conversations = Conversation.objects.filter(participants=request.user)
-    
-    # Add unread message count for each conversation
-    for conversation in conversations:
-        conversation.unread_count = Message.objects.filter(
-            conversation=conversation, 
-            sender__in=conversation.participants.exclude(id=request.user.id),
-            is_read=False
-        ).count()
-        
-        # Get the other participant
-        conversation.other_user = conversation.get_other_participant(request.user)
-        
-        # Get last message for preview
-        last_message = conversation.get_last_message()
-        conversation.last_message = last_message
+    """Show the current user's conversations, most recently active first"""
+    # Unread count, last message id and the other participant with their
+    # profile come from one annotated query plus one prefetch; the previews
+    # are then fetched together with a single in_bulk
+    last_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+    conversations = Conversation.objects.filter(members__user=request.user).annotate(
+        unread_count=F('members__unread_count'),
+        last_message_id=Subquery(last_message.values('id')[:1]),
+    ).prefetch_related(
+        Prefetch(
+            'participants',
+            queryset=User.objects.exclude(id=request.user.id).select_related('profile'),
+            to_attr='other_participants',
+        )
+    )
+    
+    # Paged on updated_at, which moves with every message: a conversation
+    # that becomes active while the user pages back jumps above the cursor,
+    # so older pages miss it (it is at the top of the first page) and it can
+    # appear twice. Accepted to keep the inbox in recency order.
+    cursor = decode_cursor(request.GET.get('cursor'))
+    page = keyset_page(conversations, cursor, INBOX_PAGE_SIZE, field='updated_at')
+    last_messages = Message.objects.in_bulk(
+        [conversation.last_message_id for conversation in page.rows if conversation.last_message_id]
+    )
+    for conversation in page.rows:
+        conversation.other_user = conversation.other_participants[0] if conversation.other_participants else None
+        conversation.last_message = last_messages.get(conversation.last_message_id)
     
     context = {
-        'conversations': conversations,
+        'conversations': page.rows,
+        'next_cursor': page.next_cursor,
+        'is_first_page': cursor is None,
     }
     return render(request, 'chat/inbox.html', context)
 
@@ -37,7 +59,7 @@ def conversation_detail(request, conversation_id):
     conversation = get_object_or_404(Conversation, id=conversation_id)
     
     # Security check: ensure the user is a participant
-    if request.user not in conversation.participants.all():
+    if not conversation.members.filter(user=request.user).exists():
         return redirect('chat-inbox')
     
     # Get the other participant
@@ -81,19 +103,18 @@ def send_message_ajax(request, conversation_id):
         conversation = get_object_or_404(Conversation, id=conversation_id)
         
         # Security check: ensure the user is a participant
-        if request.user not in conversation.participants.all():
+        if not conversation.members.filter(user=request.user).exists():
             return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
         
         content = request.POST.get('content', '').strip()
         if not content:
             return JsonResponse({'status': 'error', 'message': 'Message cannot be empty'}, status=400)
         
-        # Create new message
+        # Create new message; the chat signals count it as unread for the recipient
         message = Message.objects.create(
             conversation=conversation,
             sender=request.user,
             content=content,
-            is_read=False  # Explicitly set as unread for the recipient
         )
         
         # Update conversation timestamp
@@ -113,46 +134,61 @@ def send_message_ajax(request, conversation_id):
             'message': str(e)
         }, status=500)
 
+def message_window(conversation_id, before_id=None):
+    """
+    Return up to MESSAGES_PER_PAGE messages older than before_id (or the
+    latest ones), oldest first, and whether there are more before them.
+    
+    A backward range scan on message_conversation_idx, so the cost does not
+    depend on how long the conversation is.
+    """
+    messages = Message.objects.filter(conversation_id=conversation_id).select_related('sender')
+    if before_id:
+        messages = messages.filter(id__lt=before_id)
+    messages = list(messages.order_by('-id')[:MESSAGES_PER_PAGE + 1])
+    has_more = len(messages) > MESSAGES_PER_PAGE
+    return messages[:MESSAGES_PER_PAGE][::-1], has_more
+
+def read_new_messages(member, last_message_id):
+    """
+    Return the member's conversation messages newer than last_message_id as
+    JSON-ready dicts, moving their read watermark past them, and whether
+    older messages exist that were left out.
+    
+    With last_message_id 0 this is the initial load: only the latest window.
+    """
+    if last_message_id:
+        messages = list(
+            Message.objects.filter(conversation_id=member.conversation_id, id__gt=last_message_id)
+            .select_related('sender').order_by('id')
+        )
+        has_more = False
+    else:
+        messages, has_more = message_window(member.conversation_id)
+    
+    # Reading moves the member's watermark; polls with nothing new write nothing
+    newest_id = messages[-1].id if messages else 0
+    if newest_id > member.last_read_message_id:
+        ConversationMember.mark_read(member.conversation_id, member.user_id, newest_id)
+    
+    return [message.as_dict() for message in messages], has_more
+
 @login_required
 def get_new_messages_ajax(request, conversation_id, last_message_id):
     """AJAX endpoint for polling new messages"""
     conversation = get_object_or_404(Conversation, id=conversation_id)
     
     # Security check: ensure the user is a participant
-    if request.user not in conversation.participants.all():
+    member = conversation.members.filter(user=request.user).first()
+    if member is None:
         return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
     
     try:
-        # Convert last_message_id to integer
-        last_message_id = int(last_message_id)
-        
-        # If last_message_id is 0, return all messages for initial load
-        if last_message_id == 0:
-            messages = Message.objects.filter(conversation=conversation).order_by('created_at')
-        else:
-            # Otherwise, get only new messages with ID greater than last_message_id
-            messages = Message.objects.filter(
-                conversation=conversation,
-                id__gt=last_message_id
-            ).order_by('created_at')
-        
-        # Mark messages from others as read
-        messages.exclude(sender=request.user).update(is_read=True)
-        
-        messages_data = []
-        for message in messages:
-            messages_data.append({
-                'id': message.id,
-                'sender': message.sender.username,
-                'content': message.content,
-                'timestamp': message.created_at.strftime('%b %d, %Y, %I:%M %p'),
-                'sender_id': message.sender.id,
-                'created_at': message.created_at.strftime('%b %d, %Y, %I:%M %p')
-            })
-        
+        messages_data, has_more = read_new_messages(member, int(last_message_id))
         return JsonResponse({
             'status': 'success',
-            'messages': messages_data
+            'messages': messages_data,
+            'has_more': has_more
         })
     except Exception as e:
         return JsonResponse({
@@ -160,18 +196,52 @@ def get_new_messages_ajax(request, conversation_id, last_message_id):
             'message': str(e)
         }, status=400)
 
+@login_required
+async def wait_for_messages_ajax(request, conversation_id, last_message_id):
+    """
+    Long-polling variant of get_new_messages_ajax: answers as soon as a
+    message newer than last_message_id exists, or with an empty list after
+    LONG_POLL_TIMEOUT seconds.
+    
+    The view and the wait are async, so a waiting request holds no thread.
+    """
+    user = await request.auser()
+    member = await ConversationMember.objects.filter(conversation_id=conversation_id, user=user).afirst()
+    if member is None:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    
+    messages_data, has_more = await sync_to_async(read_new_messages)(member, last_message_id)
+    if not messages_data:
+        if await notify.wait_for_message(conversation_id, last_message_id, LONG_POLL_TIMEOUT):
+            messages_data, has_more = await sync_to_async(read_new_messages)(member, last_message_id)
+    
+    return JsonResponse({
+        'status': 'success',
+        'messages': messages_data,
+        'has_more': has_more
+    })
+
+@login_required
+def older_messages_ajax(request, conversation_id, before_id):
+    """AJAX endpoint for paging backwards through a conversation's history"""
+    # Security check: ensure the user is a participant
+    if not ConversationMember.objects.filter(conversation_id=conversation_id, user=request.user).exists():
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    
+    messages, has_more = message_window(conversation_id, before_id)
+    return JsonResponse({
+        'status': 'success',
+        'messages': [message.as_dict() for message in messages],
+        'has_more': has_more
+    })
+
 @login_required
 def unread_message_count(request):
     """AJAX endpoint to get the count of unread messages"""
-    # Get conversations where the user is a participant
-    conversations = Conversation.objects.filter(participants=request.user)
-    
-    # Count unread messages from other participants
-    unread_count = Message.objects.filter(
-        conversation__in=conversations,
-        sender__in=User.objects.exclude(id=request.user.id),
-        is_read=False
-    ).count()
+    # Each membership keeps its own unread counter
+    unread_count = ConversationMember.objects.filter(user=request.user).aggregate(
+        total=Sum('unread_count')
+    )['total'] or 0
     
     return JsonResponse({
         'unread_count': unread_count
@@ -0,0 +1,128 @@
+"""
+WebSocket transport for conversations, routed by storynest.asgi.
+
+A socket at /chat/ws/<conversation id>/ is authenticated from the Django
+session cookie and receives every hub event for its conversation as JSON:
+
+    {"type": "message", "message": {...}}            # Message.as_dict()
+    {"type": "read", "user_id": 1, "message_id": 42}
+    {"type": "typing", "user_id": 1, "username": "..."}
+
+Clients may send {"type": "typing"} and {"type": "read", "message_id": 42}.
+New messages are still posted to send_message_ajax, which keeps CSRF
+protection in one place and leaves the AJAX endpoints as a complete
+fallback when no WebSocket can be opened.
+"""
+import asyncio
+import json
+import re
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.http import parse_cookie
+from django.http.request import validate_host
+
+from . import hub
+from .models import ConversationMember, Message
+
+PATH_RE = re.compile(r'^/chat/ws/(?P<conversation_id>\d+)/$')
+
+# Close codes in the range reserved for applications
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+
+
+async def websocket_application(scope, receive, send):
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    match = PATH_RE.match(scope['path'])
+    if match is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    conversation_id = int(match['conversation_id'])
+
+    if not origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+    user = await session_user(scope)
+    if not user.is_authenticated or not await ConversationMember.objects.filter(
+        conversation_id=conversation_id, user=user
+    ).aexists():
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+
+    subscription = hub.Subscription(conversation_id)
+    await send({'type': 'websocket.accept'})
+    pusher = asyncio.create_task(push_events(subscription, send))
+    try:
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                break
+            if event['type'] == 'websocket.receive' and event.get('text'):
+                await handle_client_event(event['text'], conversation_id, user)
+    finally:
+        subscription.close()
+        pusher.cancel()
+
+
+async def push_events(subscription, send):
+    while True:
+        event = await subscription.get()
+        await send({'type': 'websocket.send', 'text': json.dumps(event)})
+
+
+async def handle_client_event(text, conversation_id, user):
+    try:
+        event = json.loads(text)
+    except ValueError:
+        return
+    if not isinstance(event, dict):
+        return
+
+    if event.get('type') == 'typing':
+        # Brokers may do network I/O, so publish off the event loop
+        await sync_to_async(hub.publish)(
+            conversation_id, {'type': 'typing', 'user_id': user.id, 'username': user.username}
+        )
+    elif event.get('type') == 'read':
+        message_id = event.get('message_id')
+        if not isinstance(message_id, int) or message_id <= 0:
+            return
+        # Only a message that exists in this conversation can move the
+        # watermark; a larger id would swallow future unread messages
+        if not await Message.objects.filter(conversation_id=conversation_id, id=message_id).aexists():
+            return
+        # Publishes the read receipt when the watermark moves
+        await sync_to_async(ConversationMember.mark_read)(conversation_id, user.id, message_id)
+
+
+async def session_user(scope):
+    """The user logged in to the session named by the request's cookie"""
+    headers = dict(scope.get('headers', ()))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return await aget_user(SimpleNamespace(session=session))
+
+
+def origin_allowed(scope):
+    """
+    Reject sockets opened by pages on other sites, which would otherwise
+    ride on the user's session cookie.
+    """
+    headers = dict(scope.get('headers', ()))
+    origin = headers.get(b'origin')
+    if origin is None:
+        return True
+    host = urlsplit(origin.decode('latin-1')).hostname or ''
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    return validate_host(host, allowed_hosts)
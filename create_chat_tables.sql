@@ -5,11 +5,13 @@ CREATE TABLE IF NOT EXISTS chat_conversation (
     updated_at DATETIME NOT NULL
 );
 
--- Create the chat_conversation_participants table for the many-to-many relationship
+-- Create the chat_conversation_participants table for conversation members and their read state
 CREATE TABLE IF NOT EXISTS chat_conversation_participants (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     conversation_id INTEGER NOT NULL,
     user_id INTEGER NOT NULL,
+    last_read_message_id BIGINT NOT NULL DEFAULT 0,
+    unread_count INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (conversation_id) REFERENCES chat_conversation (id),
     FOREIGN KEY (user_id) REFERENCES auth_user (id),
     UNIQUE (conversation_id, user_id)
@@ -20,7 +22,6 @@ CREATE TABLE IF NOT EXISTS chat_message (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     content TEXT NOT NULL,
     created_at DATETIME NOT NULL,
-    is_read BOOLEAN NOT NULL,
     conversation_id INTEGER NOT NULL,
     sender_id INTEGER NOT NULL,
     FOREIGN KEY (conversation_id) REFERENCES chat_conversation (id),
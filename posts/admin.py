@@ -1,11 +1,22 @@
 from django.contrib import admin
 from .models import NormalPost, AnnouncementPost, CommunityPost, Comment, Notification
+from .search import get_backend as get_search_backend
 
 # Register your models here.
 admin.site.register(Comment)
 
+class PostSearchMixin:
+    """Answer the admin search box from the full-text index instead of scanning"""
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        # Every match, as a subquery on the index, so nothing is cut off
+        return get_search_backend().filter(queryset, search_term), False
+
 @admin.register(AnnouncementPost)
-class AnnouncementPostAdmin(admin.ModelAdmin):
+class AnnouncementPostAdmin(PostSearchMixin, admin.ModelAdmin):
+    exclude = ('post_type', 'is_sticky', 'category')
     list_display = ('title', 'event_date', 'is_active', 'author')
     list_filter = ('is_active', 'event_date')
     search_fields = ('title', 'content')
@@ -17,7 +28,8 @@ class AnnouncementPostAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 @admin.register(CommunityPost)
-class CommunityPostAdmin(admin.ModelAdmin):
+class CommunityPostAdmin(PostSearchMixin, admin.ModelAdmin):
+    exclude = ('post_type', 'event_date', 'is_active')
     list_display = ('title', 'category', 'is_sticky', 'author')
     list_filter = ('category', 'is_sticky')
     search_fields = ('title', 'content')
@@ -28,7 +40,8 @@ class CommunityPostAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 @admin.register(NormalPost)
-class NormalPostAdmin(admin.ModelAdmin):
+class NormalPostAdmin(PostSearchMixin, admin.ModelAdmin):
+    exclude = ('post_type', 'event_date', 'is_active', 'is_sticky', 'category')
     list_display = ('title', 'author', 'created_at')
     search_fields = ('title', 'content')
     date_hierarchy = 'created_at'
@@ -44,7 +57,7 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def get_post(self, obj):
         if obj.post_id:
-            return f'{obj.post_type} #{obj.post_id}'
+            return f'{obj.get_post_type()} #{obj.post_id}'
         return '-'
     get_post.short_description = 'Post'
     
@@ -0,0 +1,71 @@
+"""
+Cached upcoming-announcements sidebar.
+
+The list is stored in the default cache until the earliest event in it
+starts, at which point it expires by itself so past events drop off, and
+for at most ANNOUNCEMENT_CACHE_TIMEOUT seconds. The post signals delete it
+whenever an announcement is saved or deleted.
+
+With no CACHES configured, Django's default cache is local to each
+process, so that delete only reaches the process that handled the change;
+other workers show the old sidebar until their copy times out. Keep the
+timeout short unless a shared cache backend is configured. Hit and miss
+totals are kept in the same cache and are per process for the same reason.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import AnnouncementPost
+
+CACHE_KEY = 'announcements:upcoming'
+HITS_KEY = 'announcements:hits'
+MISSES_KEY = 'announcements:misses'
+
+SIDEBAR_SIZE = 5
+
+
+def get_upcoming_announcements():
+    """Return the next few active announcements, newest event last"""
+    announcements = cache.get(CACHE_KEY)
+    if announcements is not None:
+        _count(HITS_KEY)
+        return announcements
+    _count(MISSES_KEY)
+
+    now = timezone.now()
+    announcements = list(
+        AnnouncementPost.objects.filter(is_active=True, event_date__gte=now)
+        .only('id', 'post_type', 'title', 'content', 'event_date')
+        .order_by('event_date')[:SIDEBAR_SIZE]
+    )
+    timeout = settings.ANNOUNCEMENT_CACHE_TIMEOUT
+    if announcements:
+        until_first_event = (announcements[0].event_date - now).total_seconds()
+        timeout = max(1, min(timeout, int(until_first_event)))
+    cache.set(CACHE_KEY, announcements, timeout)
+    return announcements
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+    }
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First event since the counter was created or evicted
+        if not cache.add(key, 1, None):
+            cache.incr(key)
@@ -0,0 +1,17 @@
+def notifications(request):
+    """Unread notification count for the navbar badge.
+
+    Read from the counter on the user's profile, which base.html loads anyway,
+    and only when a template actually uses it.
+    """
+    user = getattr(request, 'user', None)
+
+    def unread_notifications_count():
+        if user is None or not user.is_authenticated:
+            return 0
+        try:
+            return user.profile.unread_notifications
+        except AttributeError:
+            return 0
+
+    return {'unread_notifications_count': unread_notifications_count}
@@ -0,0 +1,102 @@
+"""
+Home feed engine.
+
+All post types live in the single post table, so the feed is one indexed
+query ordered by (created_at, post_type, pk) and paged with keyset
+cursors. Fetching page N costs the same as fetching page 1.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from .models import BasePost, POST_MODELS
+
+# Columns a post card needs; everything else stays deferred
+FEED_FIELDS = (
+    'id', 'post_type', 'title', 'content', 'image', 'author_id',
+    'created_at', 'updated_at', 'like_count', 'comment_count',
+)
+
+
+class FeedCursor:
+    """Position in the feed: the (created_at, post_type, pk) of the last post seen"""
+
+    def __init__(self, created_at, post_type, pk):
+        self.created_at = created_at
+        self.post_type = post_type
+        self.pk = pk
+
+    @classmethod
+    def for_post(cls, post):
+        return cls(post.created_at, post.get_post_type(), post.pk)
+
+    def encode(self):
+        micros = int(self.created_at.timestamp() * 1_000_000)
+        return f'{micros}.{self.post_type}.{self.pk}'
+
+    @classmethod
+    def decode(cls, value):
+        """Parse a cursor from a query string value, returning None if it is invalid"""
+        if not value:
+            return None
+        try:
+            micros, post_type, pk = value.split('.')
+            created_at = datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc)
+            pk = int(pk)
+        except (ValueError, OverflowError, OSError):
+            return None
+        if post_type not in POST_MODELS:
+            return None
+        return cls(created_at, post_type, pk)
+
+    def as_filter(self, pk_field='pk'):
+        """Filter for posts that sort after this cursor"""
+        return (
+            Q(created_at__lt=self.created_at)
+            | Q(created_at=self.created_at, post_type__lt=self.post_type)
+            | Q(created_at=self.created_at, post_type=self.post_type, **{f'{pk_field}__lt': self.pk})
+        )
+
+
+class FeedPage:
+    """A single page of feed posts plus the cursor for the next page"""
+
+    def __init__(self, posts, next_cursor=None):
+        self.posts = posts
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def get_feed_page(cursor=None, page_size=5):
+    """
+    Return one page of the feed, newest first.
+
+    Only the card columns are selected and authors are loaded in a second
+    query with their profiles, so a page always costs two queries.
+    """
+    return make_page(pull_posts(cursor, page_size + 1), page_size)
+
+
+def pull_posts(cursor, limit):
+    """Up to limit feed posts after cursor, without their authors"""
+    queryset = BasePost.objects.only(*FEED_FIELDS)
+    if cursor is not None:
+        queryset = queryset.filter(cursor.as_filter())
+    return list(queryset.order_by('-created_at', '-post_type', '-pk')[:limit])
+
+
+def make_page(posts, page_size):
+    """Build a FeedPage from up to page_size + 1 posts, attaching their authors"""
+    has_next = len(posts) > page_size
+    posts = posts[:page_size]
+
+    authors = User.objects.select_related('profile').in_bulk({post.author_id for post in posts})
+    for post in posts:
+        post.author = authors[post.author_id]
+
+    next_cursor = FeedCursor.for_post(posts[-1]).encode() if has_next else None
+    return FeedPage(posts, next_cursor)
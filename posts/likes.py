@@ -0,0 +1,66 @@
+"""
+Helpers for post likes.
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import BasePost
+from .signals import post_liked, post_unliked
+
+# Outcome of toggle_like: the new like state, whether this call changed it,
+# and the post's like counter afterwards
+LikeToggle = namedtuple('LikeToggle', ['liked', 'changed', 'like_count'])
+
+
+def mark_liked_by(posts, user):
+    """
+    Set liked_by_viewer on every post in a page.
+
+    The viewer's likes for the whole page are resolved with a single query
+    on the likes table instead of loading every liker of every post.
+    """
+    posts = list(posts)
+    liked_ids = set()
+    if user.is_authenticated and posts:
+        liked_ids = set(
+            BasePost.likes.through.objects.filter(
+                user_id=user.pk,
+                basepost_id__in=[post.pk for post in posts],
+            ).values_list('basepost_id', flat=True)
+        )
+    for post in posts:
+        post.liked_by_viewer = post.pk in liked_ids
+    return posts
+
+
+def toggle_like(post_id, user):
+    """
+    Like or unlike a post in a bounded number of statements.
+
+    A conditional DELETE removes an existing like. If there was none, the
+    like is inserted and the unique constraint on the likes table settles
+    races between concurrent clicks. The count comes from the maintained
+    like_count column rather than a COUNT over the likers.
+    """
+    Like = BasePost.likes.through
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(basepost_id=post_id, user_id=user.pk).delete()
+        if deleted:
+            liked, changed = False, True
+            BasePost.objects.filter(pk=post_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+            post_unliked.send(sender=BasePost, post_id=post_id, user=user)
+        else:
+            try:
+                with transaction.atomic():
+                    Like.objects.create(basepost_id=post_id, user_id=user.pk)
+            except IntegrityError:
+                # A concurrent request already liked the post
+                liked, changed = True, False
+            else:
+                liked, changed = True, True
+                BasePost.objects.filter(pk=post_id).update(like_count=F('like_count') + 1)
+                post_liked.send(sender=BasePost, post_id=post_id, user=user)
+        like_count = BasePost.objects.filter(pk=post_id).values_list('like_count', flat=True).get()
+    return LikeToggle(liked, changed, like_count)
@@ -0,0 +1,69 @@
+import json
+import time
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+from posts.models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Delete old read notifications and expired sessions in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90,
+                            help='Delete read notifications not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of rows to delete per batch')
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Seconds to pause between batches')
+        parser.add_argument('--archive', metavar='FILE',
+                            help='Append deleted notifications to FILE as JSON lines')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.pause = options['sleep']
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        # Read means opened individually or under the recipient's read watermark
+        notifications = Notification.objects.filter(updated_at__lt=cutoff).filter(
+            Q(is_read=True) | Q(updated_at__lte=F('recipient__profile__notifications_read_at'))
+        )
+        archive = open(options['archive'], 'a') if options['archive'] else None
+        try:
+            self.prune('notifications', notifications, archive)
+        finally:
+            if archive:
+                archive.close()
+
+        self.prune('sessions', Session.objects.filter(expire_date__lt=timezone.now()))
+
+    def prune(self, label, queryset, archive=None):
+        """Delete queryset in primary key order, one short transaction per batch"""
+        deleted = 0
+        started = time.monotonic()
+        last_pk = None
+        while True:
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            rows = queryset.model.objects.filter(pk__in=pks)
+            if archive:
+                for row in rows.values():
+                    archive.write(json.dumps(row, default=str) + '\n')
+            # Count only this model's rows, not the ones removed by cascade
+            deleted += rows.delete()[1].get(queryset.model._meta.label, 0)
+            time.sleep(self.pause)
+
+        elapsed = time.monotonic() - started
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} {label} in {elapsed:.1f}s ({rate:.0f} rows/s).'
+        ))
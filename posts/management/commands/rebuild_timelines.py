@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from posts.timeline import audience, rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed home timeline of every active user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of users to rebuild per batch')
+        parser.add_argument('--user', dest='username',
+                            help='Only rebuild the timeline of this user')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = audience()
+        if options['username']:
+            users = users.filter(username=options['username'])
+
+        rebuilt = entries = 0
+        last_pk = 0
+        while True:
+            user_ids = list(users.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            entries += rebuild_timeline(user_ids) * len(user_ids)
+            rebuilt += len(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} timelines with {entries} entries.'))
@@ -0,0 +1,86 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from posts.models import BasePost, Comment, Notification
+from users.models import Profile
+
+
+def count_subquery(queryset, field):
+    """Correlated COUNT of rows in queryset whose field points at the outer row"""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the denormalized like, comment, reply and unread notification counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of posts to check per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        actual_likes = count_subquery(BasePost.likes.through.objects.all(), 'basepost_id')
+        actual_comments = count_subquery(Comment.objects.all(), 'post_id')
+
+        checked = repaired = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                BasePost.objects.filter(pk__gt=last_pk).order_by('pk')
+                .annotate(actual_likes=actual_likes, actual_comments=actual_comments)
+                .values_list('pk', 'like_count', 'comment_count', 'actual_likes', 'actual_comments')
+                [:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            checked += len(batch)
+
+            stale = [pk for pk, likes, comments, real_likes, real_comments in batch
+                     if likes != real_likes or comments != real_comments]
+            if stale:
+                # Recompute inside the UPDATE so concurrent likes are not lost
+                repaired += BasePost.objects.filter(pk__in=stale).update(
+                    like_count=actual_likes,
+                    comment_count=actual_comments,
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} posts, repaired {repaired}.'))
+
+        # Reply counters on top-level comments
+        actual_replies = count_subquery(Comment.objects.all(), 'parent_id')
+        checked = repaired = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Comment.objects.filter(pk__gt=last_pk, parent__isnull=True).order_by('pk')
+                .annotate(actual_replies=actual_replies)
+                .values_list('pk', 'reply_count', 'actual_replies')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            checked += len(batch)
+
+            stale = [pk for pk, replies, real_replies in batch if replies != real_replies]
+            if stale:
+                repaired += Comment.objects.filter(pk__in=stale).update(reply_count=actual_replies)
+
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} comments, repaired {repaired}.'))
+
+        # Unread notification counters on profiles, counting only groups
+        # above each user's read watermark
+        watermark = Coalesce(OuterRef('notifications_read_at'), Value(datetime.min.replace(tzinfo=dt_timezone.utc)))
+        unread = Coalesce(Subquery(
+            Notification.objects.filter(recipient_id=OuterRef('user_id'), is_read=False, updated_at__gt=watermark).order_by()
+            .values('recipient_id').annotate(total=Count('pk')).values('total')
+        ), 0)
+        repaired = Profile.objects.annotate(actual_unread=unread).exclude(
+            unread_notifications=F('actual_unread')
+        ).update(unread_notifications=unread)
+        self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} unread notification counters.'))
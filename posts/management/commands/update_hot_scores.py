@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from posts.models import BasePost, CommunityPost
+from posts.ranking import RANKING_WINDOW_DAYS, hot_score
+
+
+class Command(BaseCommand):
+    help = 'Recompute the trending score of recent community posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of posts to score per batch')
+        parser.add_argument('--days', type=int, default=RANKING_WINDOW_DAYS,
+                            help='Only rescore posts created within this many days')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['days'])
+
+        scored = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                CommunityPost.objects.filter(created_at__gte=cutoff, pk__gt=last_pk).order_by('pk')
+                .only('id', 'post_type', 'like_count', 'comment_count', 'created_at')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for post in batch:
+                post.hot_score = hot_score(post.like_count, post.comment_count, post.created_at, now)
+            BasePost.objects.bulk_update(batch, ['hot_score'])
+            scored += len(batch)
+
+        # Posts that left the window drop out of trending entirely
+        expired = CommunityPost.objects.filter(created_at__lt=cutoff, hot_score__gt=0).update(hot_score=0)
+
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} posts, expired {expired}.'))
@@ -0,0 +1,156 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+POST_TABLES = (
+    ('normal', 'NormalPost'),
+    ('announcement', 'AnnouncementPost'),
+    ('community', 'CommunityPost'),
+)
+
+
+def copy_posts(apps, schema_editor):
+    """Move every row of the three post tables into the single post table"""
+    BasePost = apps.get_model('posts', 'BasePost')
+    Comment = apps.get_model('posts', 'Comment')
+    Notification = apps.get_model('posts', 'Notification')
+    Like = BasePost.likes.through
+
+    # (post_type, old id) -> new id
+    id_map = {}
+    for post_type, model_name in POST_TABLES:
+        OldPost = apps.get_model('posts', model_name)
+        for old in OldPost.objects.order_by('pk').iterator():
+            new = BasePost(
+                post_type=post_type,
+                title=old.title,
+                content=old.content,
+                image=old.image,
+                author_id=old.author_id,
+            )
+            if post_type == 'announcement':
+                new.event_date = old.event_date
+                new.is_active = old.is_active
+            elif post_type == 'community':
+                new.is_sticky = old.is_sticky
+                new.category = old.category
+            new.save()
+            # auto_now_add/auto_now would otherwise stamp the migration time
+            BasePost.objects.filter(pk=new.pk).update(
+                created_at=old.created_at,
+                updated_at=old.updated_at,
+            )
+            Like.objects.bulk_create([
+                Like(basepost_id=new.pk, user_id=user_id)
+                for user_id in old.likes.values_list('id', flat=True)
+            ])
+            id_map[(post_type, old.pk)] = new.pk
+
+    # Remap in Python so a new id can never be mistaken for an old one
+    comments = []
+    for comment in Comment.objects.exclude(post_id=None).only('id', 'post_id', 'post_type'):
+        comment.post_id = id_map.get((comment.post_type, comment.post_id))
+        comments.append(comment)
+    Comment.objects.bulk_update(comments, ['post_id'], batch_size=500)
+
+    notifications = []
+    for notification in Notification.objects.exclude(post=None).only('id', 'post'):
+        notification.target_id = id_map.get(('normal', notification.post_id))
+        notifications.append(notification)
+    Notification.objects.bulk_update(notifications, ['target'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_remove_comment_post_comment_post_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BasePost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_type', models.CharField(choices=[('normal', 'Normal Post'), ('announcement', 'Announcement'), ('community', 'Community Post')], max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('image', models.FileField(blank=True, null=True, upload_to='post_media')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event_date', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_sticky', models.BooleanField(default=False, help_text='If checked, this post will be pinned to the top.')),
+                ('category', models.CharField(choices=[('general', 'General Discussion'), ('events', 'Community Events'), ('support', 'Support & Help'), ('ideas', 'Feature Requests')], default='general', max_length=50)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL)),
+                ('likes', models.ManyToManyField(blank=True, related_name='liked_posts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [
+                    models.Index(fields=['-created_at', '-post_type', '-id'], name='post_feed_idx'),
+                    models.Index(fields=['author', '-created_at'], name='post_author_idx'),
+                    models.Index(fields=['post_type', '-created_at'], name='post_type_idx'),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='target',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.basepost'),
+        ),
+        migrations.RunPython(copy_posts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='notification',
+            name='post',
+        ),
+        migrations.RenameField(
+            model_name='notification',
+            old_name='target',
+            new_name='post',
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='posts.basepost'),
+        ),
+        migrations.DeleteModel(
+            name='NormalPost',
+        ),
+        migrations.DeleteModel(
+            name='AnnouncementPost',
+        ),
+        migrations.DeleteModel(
+            name='CommunityPost',
+        ),
+        migrations.CreateModel(
+            name='NormalPost',
+            fields=[],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('posts.basepost',),
+        ),
+        migrations.CreateModel(
+            name='AnnouncementPost',
+            fields=[],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('posts.basepost',),
+        ),
+        migrations.CreateModel(
+            name='CommunityPost',
+            fields=[],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('posts.basepost',),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    BasePost = apps.get_model('posts', 'BasePost')
+    Comment = apps.get_model('posts', 'Comment')
+    Like = BasePost.likes.through
+
+    likes = Like.objects.filter(basepost_id=OuterRef('pk')).order_by().values('basepost_id')
+    comments = Comment.objects.filter(post_id=OuterRef('pk')).order_by().values('post_id')
+    BasePost.objects.update(
+        like_count=Coalesce(Subquery(likes.annotate(total=Count('pk')).values('total')), 0),
+        comment_count=Coalesce(Subquery(comments.annotate(total=Count('pk')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_basepost_consolidate_post_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='basepost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='basepost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
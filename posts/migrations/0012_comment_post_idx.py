@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_basepost_like_count_basepost_comment_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post_id', '-created_at', '-id'], name='comment_post_idx'),
+        ),
+    ]
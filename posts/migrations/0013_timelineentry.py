@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_comment_post_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_type', models.CharField(choices=[('normal', 'Normal Post'), ('announcement', 'Announcement'), ('community', 'Community Post')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='posts.basepost')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'timeline entries',
+                'ordering': ['-created_at', '-post_type', '-post'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-post_type', '-post'], name='timeline_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'post'), name='timeline_user_post_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_search'
+
+VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the vendor specific full-text index for posts"""
+    post_table = apps.get_model('posts', 'BasePost')._meta.db_table
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'ALTER TABLE {post_table} ADD COLUMN search_vector tsvector')
+        schema_editor.execute(f'UPDATE {post_table} SET search_vector = {VECTOR_SQL}')
+        schema_editor.execute(
+            f'CREATE INDEX posts_search_vector_idx ON {post_table} USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, content, post_type UNINDEXED)'
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, content, post_type) '
+            f'SELECT id, title, content, post_type FROM {post_table}'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    post_table = apps.get_model('posts', 'BasePost')._meta.db_table
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS posts_search_vector_idx')
+        schema_editor.execute(f'ALTER TABLE {post_table} DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='basepost',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='basepost',
+            index=models.Index(fields=['post_type', '-hot_score', '-id'], name='post_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='basepost',
+            index=models.Index(fields=['post_type', 'category', '-hot_score', '-id'], name='post_category_hot_idx'),
+        ),
+    ]
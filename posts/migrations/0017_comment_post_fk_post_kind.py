@@ -0,0 +1,87 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+POST_KINDS = [(1, 'Normal Post'), (2, 'Announcement'), (3, 'Community Post')]
+POST_KIND_CODES = {'normal': 1, 'announcement': 2, 'community': 3}
+
+
+def link_posts(apps, schema_editor):
+    """Point comments at their post row and fill in the type codes"""
+    BasePost = apps.get_model('posts', 'BasePost')
+    Comment = apps.get_model('posts', 'Comment')
+    Notification = apps.get_model('posts', 'Notification')
+
+    # Comments whose post no longer exists have nothing to attach to
+    Comment.objects.exclude(legacy_post_id__in=BasePost.objects.values('pk')).delete()
+    Comment.objects.update(post_id=models.F('legacy_post_id'))
+
+    for post_type, code in POST_KIND_CODES.items():
+        posts = BasePost.objects.filter(post_type=post_type).values('pk')
+        Comment.objects.filter(post_id__in=posts).update(post_kind=code)
+        Notification.objects.filter(post_id__in=posts).update(post_kind=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_comment_replies'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_idx',
+        ),
+        migrations.RenameField(
+            model_name='comment',
+            old_name='post_id',
+            new_name='legacy_post_id',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.basepost'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='post_kind',
+            field=models.PositiveSmallIntegerField(choices=POST_KINDS, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='post_kind',
+            field=models.PositiveSmallIntegerField(blank=True, choices=POST_KINDS, null=True),
+        ),
+        migrations.RunPython(link_posts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='comment',
+            name='legacy_post_id',
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='post_type',
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.basepost'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post_kind',
+            field=models.PositiveSmallIntegerField(choices=POST_KINDS, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='post',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='posts.basepost'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created_at', '-id'], name='comment_post_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['post', '-created_at'], name='notification_post_idx'),
+        ),
+    ]
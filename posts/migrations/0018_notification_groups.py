@@ -0,0 +1,104 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+RECENT_ACTORS = 3
+
+
+def group_notifications(apps, schema_editor):
+    """Collapse existing like and comment notifications into one row per post"""
+    Notification = apps.get_model('posts', 'Notification')
+    NotificationActor = apps.get_model('posts', 'NotificationActor')
+    Notification.objects.update(updated_at=models.F('created_at'))
+
+    rows = (
+        Notification.objects.filter(notification_type__in=('like', 'comment'))
+        .exclude(post=None)
+        .order_by('recipient_id', 'notification_type', 'post_id', '-created_at', '-id')
+        .values_list('id', 'recipient_id', 'notification_type', 'post_id', 'actor_id', 'created_at', 'is_read')
+    )
+    groups = {}
+    for pk, recipient_id, notification_type, post_id, actor_id, created_at, is_read in rows.iterator():
+        groups.setdefault((recipient_id, notification_type, post_id), []).append((pk, actor_id, created_at, is_read))
+
+    for members in groups.values():
+        keep_pk, _, newest, _ = members[0]
+        # Newest first, so each actor keeps the time of their latest action
+        acted_at = {}
+        for _, actor_id, created_at, _ in members:
+            acted_at.setdefault(actor_id, created_at)
+        Notification.objects.filter(pk=keep_pk).update(
+            recent_actors=list(acted_at)[:RECENT_ACTORS],
+            actor_count=len(acted_at),
+            updated_at=newest,
+            is_read=all(is_read for _, _, _, is_read in members),
+        )
+        Notification.objects.filter(pk__in=[pk for pk, _, _, _ in members[1:]]).delete()
+        NotificationActor.objects.bulk_create(
+            NotificationActor(notification_id=keep_pk, user_id=actor_id, acted_at=when)
+            for actor_id, when in acted_at.items()
+        )
+
+    # Everything else names just its own actor
+    for notification in Notification.objects.filter(recent_actors=[]).iterator():
+        Notification.objects.filter(pk=notification.pk).update(recent_actors=[notification.actor_id])
+        NotificationActor.objects.create(
+            notification_id=notification.pk, user_id=notification.actor_id, acted_at=notification.created_at
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_comment_post_fk_post_kind'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='notification',
+            options={'ordering': ['-updated_at']},
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='posts.comment'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='recent_actors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('acted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actor_links', to='posts.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('notification', 'user'), name='notification_actor_unique')],
+            },
+        ),
+        migrations.RunPython(group_notifications, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-updated_at'], name='notification_recipient_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('notification_type__in', ('like', 'comment'))), fields=('recipient', 'notification_type', 'post'), name='notification_group_unique'),
+        ),
+    ]
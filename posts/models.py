@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
@@ -6,41 +6,100 @@ from PIL import Image
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from users.models import Profile
 
-# Base Post model with common fields
+POST_TYPES = (
+    ('normal', 'Normal Post'),
+    ('announcement', 'Announcement'),
+    ('community', 'Community Post'),
+)
+
+# Compact type codes stored next to post references on comments and notifications
+POST_KIND_CODES = {'normal': 1, 'announcement': 2, 'community': 3}
+POST_KIND_TYPES = {code: post_type for post_type, code in POST_KIND_CODES.items()}
+POST_KINDS = tuple((POST_KIND_CODES[post_type], label) for post_type, label in POST_TYPES)
+
+COMMUNITY_CATEGORIES = (
+    ('general', 'General Discussion'),
+    ('events', 'Community Events'),
+    ('support', 'Support & Help'),
+    ('ideas', 'Feature Requests'),
+)
+
+class PostTypeManager(models.Manager):
+    """Manager that limits a proxy post model to its own post type"""
+    def __init__(self, post_type=None):
+        super().__init__()
+        self.post_type = post_type
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.post_type:
+            queryset = queryset.filter(post_type=self.post_type)
+        return queryset
+
+# Single post table for every post type. Type specific columns are nullable
+# and the proxy models below keep the per-type Python API.
 class BasePost(models.Model):
+    POST_TYPE = None
+    
+    post_type = models.CharField(max_length=20, choices=POST_TYPES)
     title = models.CharField(max_length=200)
     content = models.TextField()
     image = models.FileField(upload_to='post_media', blank=True, null=True)
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='%(class)s_posts')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    likes = models.ManyToManyField(User, related_name='%(class)s_likes', blank=True)
+    likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
+    
+    # Denormalized counters, kept in step by the like/comment views and
+    # signals. Run `manage.py recount` to repair drift.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    
+    # Time-decayed engagement score, refreshed by `manage.py update_hot_scores`
+    hot_score = models.FloatField(default=0)
+    
+    # Announcement fields
+    event_date = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    
+    # Community fields
+    is_sticky = models.BooleanField(default=False, help_text='If checked, this post will be pinned to the top.')
+    category = models.CharField(max_length=50, choices=COMMUNITY_CATEGORIES, default='general')
     
     class Meta:
-        abstract = True
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-post_type', '-id'], name='post_feed_idx'),
+            models.Index(fields=['author', '-created_at'], name='post_author_idx'),
+            models.Index(fields=['post_type', '-created_at'], name='post_type_idx'),
+            models.Index(fields=['post_type', '-hot_score', '-id'], name='post_hot_idx'),
+            models.Index(fields=['post_type', 'category', '-hot_score', '-id'], name='post_category_hot_idx'),
+        ]
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.POST_TYPE and not self.__dict__.get('post_type'):
+            self.post_type = self.POST_TYPE
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Rows loaded through BasePost come back as their proxy model
+        proxy = POST_MODELS.get(instance.__dict__.get('post_type'))
+        if proxy is not None and not isinstance(instance, proxy):
+            instance.__class__ = proxy
+        return instance
     
     def get_post_type(self):
         """Get the type of this post"""
-        if isinstance(self, NormalPost):
-            return 'normal'
-        elif isinstance(self, AnnouncementPost):
-            return 'announcement'
-        elif isinstance(self, CommunityPost):
-            return 'community'
-        return 'unknown'
-    
-    def get_post_type_display(self):
-        """Get the display name for the post type"""
-        post_type = self.get_post_type()
-        if post_type == 'normal':
-            return 'Normal Post'
-        elif post_type == 'announcement':
-            return 'Announcement'
-        elif post_type == 'community':
-            return 'Community Post'
-        return 'Unknown Post Type'
+        return self.post_type or 'unknown'
+    
+    def get_post_kind(self):
+        """Get the small integer code for this post's type"""
+        return POST_KIND_CODES.get(self.post_type)
     
     def get_url_kwargs(self):
         """Get kwargs for URL patterns"""
@@ -53,10 +112,10 @@ class BasePost(models.Model):
         return self.title
     
     def get_absolute_url(self):
-        return reverse(f'{self._meta.model_name}-detail', kwargs={'pk': self.pk})
+        return reverse(self.get_detail_url(), kwargs=self.get_url_kwargs())
     
     def get_like_count(self):
-        return self.likes.count()
+        return self.like_count
     
     def get_detail_url(self):
         return f'post-{self.get_post_type()}-detail'
@@ -92,98 +151,88 @@ class BasePost(models.Model):
         except Exception as e:
             print(f"Error processing post image: {e}")
 
-    def get_post_type(self):
-        """Get the type of this post"""
-        if isinstance(self, NormalPost):
-            return 'normal'
-        elif isinstance(self, AnnouncementPost):
-            return 'announcement'
-        elif isinstance(self, CommunityPost):
-            return 'community'
-        return 'unknown'
-    
-    def get_post_type_display(self):
-        """Get the display name for the post type"""
-        post_type = self.get_post_type()
-        if post_type == 'normal':
-            return 'Normal Post'
-        elif post_type == 'announcement':
-            return 'Announcement'
-        elif post_type == 'community':
-            return 'Community Post'
-        return 'Unknown Post Type'
-
-    def get_url_kwargs(self):
-        """Get kwargs for URL patterns"""
-        return {
-            'pk': self.id,
-            'post_type': self.get_post_type()
-        }
-
 # Normal Post - Regular user posts
 class NormalPost(BasePost):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.post_type = 'normal'
+    POST_TYPE = 'normal'
+    
+    objects = PostTypeManager(POST_TYPE)
+    
+    class Meta:
+        proxy = True
 
 # Announcement Post - Special posts for announcements
 class AnnouncementPost(BasePost):
-    event_date = models.DateTimeField()
-    is_active = models.BooleanField(default=True)
+    POST_TYPE = 'announcement'
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.post_type = 'announcement'
+    objects = PostTypeManager(POST_TYPE)
+    
+    class Meta:
+        proxy = True
+    
+    def clean(self):
+        super().clean()
+        if not self.event_date:
+            raise ValidationError({'event_date': 'Announcements need an event date.'})
     
     @property
     def is_past_event(self):
-        return self.event_date < timezone.now()
+        return self.event_date is not None and self.event_date < timezone.now()
 
 # Community Post - Posts for community discussions
 class CommunityPost(BasePost):
-    is_sticky = models.BooleanField(default=False, help_text='If checked, this post will be pinned to the top.')
-    category = models.CharField(max_length=50, choices=[
-        ('general', 'General Discussion'),
-        ('events', 'Community Events'),
-        ('support', 'Support & Help'),
-        ('ideas', 'Feature Requests')
-    ], default='general')
+    POST_TYPE = 'community'
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.post_type = 'community'
+    objects = PostTypeManager(POST_TYPE)
+    
+    class Meta:
+        proxy = True
+
+# Proxy model for each post type
+POST_MODELS = {
+    'normal': NormalPost,
+    'announcement': AnnouncementPost,
+    'community': CommunityPost,
+}
+
+def get_post_model(post_type, default=NormalPost):
+    """Get the proxy model for a post type string"""
+    return POST_MODELS.get(post_type, default)
 
 # Comment model for all post types
 class Comment(models.Model):
     content = models.TextField()
-    post_id = models.IntegerField(null=True, blank=True)
-    post_type = models.CharField(max_length=20, null=True, blank=True)
+    # Indexed by comment_post_idx below; deleting a post deletes its comments
+    post = models.ForeignKey(BasePost, on_delete=models.CASCADE, related_name='comments', db_index=False)
+    # Copied from the post on every save, so it cannot disagree with it
+    post_kind = models.PositiveSmallIntegerField(choices=POST_KINDS, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='%(class)s_comments')
+    # Replies are one level deep: a reply's parent is always a top-level comment
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies', db_index=False)
+    reply_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_idx'),
+            models.Index(fields=['parent', 'created_at', 'id'], name='comment_reply_idx'),
+        ]
     
     def __str__(self):
-        return f"Comment by {self.author.username} on {self.get_post().title if self.get_post() else 'Unknown Post'}"
+        return f"Comment by {self.author.username} on {self.post.title}"
+    
+    def save(self, *args, **kwargs):
+        self.post_kind = self.post.get_post_kind()
+        super().save(*args, **kwargs)
     
     def get_post(self):
-        """Get the actual post object based on type and id"""
-        if not self.post_id or not self.post_type:
-            return None
-            
-        if self.post_type == 'normal':
-            return NormalPost.objects.get(id=self.post_id)
-        elif self.post_type == 'announcement':
-            return AnnouncementPost.objects.get(id=self.post_id)
-        elif self.post_type == 'community':
-            return CommunityPost.objects.get(id=self.post_id)
-        return None
+        """Get the post this comment belongs to"""
+        return self.post
     
     def get_post_type(self):
         """Get the type of the post this comment belongs to"""
-        return self.post_type
+        return POST_KIND_TYPES.get(self.post_kind)
 
 # Notification model for tracking interactions
 class Notification(models.Model):
@@ -194,17 +243,178 @@ class Notification(models.Model):
         ('mention', 'Mention'),
         ('announcement', 'Announcement')
     )
+    # Types collapsed into one row per (recipient, type, post)
+    GROUPED_TYPES = ('like', 'comment')
+    RECENT_ACTORS = 3
     
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_notifications')
-    post = models.ForeignKey('NormalPost', on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
-    comment = models.ForeignKey('Comment', on_delete=models.CASCADE, null=True, blank=True)
+    post = models.ForeignKey('BasePost', on_delete=models.CASCADE, null=True, blank=True, related_name='notifications', db_index=False)
+    post_kind = models.PositiveSmallIntegerField(choices=POST_KINDS, null=True, blank=True)
+    # Deleting the latest comment must not take the rest of the group with it
+    comment = models.ForeignKey('Comment', on_delete=models.SET_NULL, null=True, blank=True)
+    # Ids of the latest actors in a group, newest first, and how many distinct
+    # actors it has (one NotificationActor row each). `actor` is the most recent.
+    recent_actors = models.JSONField(default=list, blank=True)
+    actor_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
     is_read = models.BooleanField(default=False)
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['post', '-created_at'], name='notification_post_idx'),
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notification_recipient_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipient', 'notification_type', 'post'],
+                condition=models.Q(notification_type__in=('like', 'comment')),
+                name='notification_group_unique',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.notification_type} notification from {self.actor.username} to {self.recipient.username}"
+    
+    def save(self, *args, **kwargs):
+        if self.post_kind is None and self.post_id:
+            self.post_kind = self.post.get_post_kind()
+        super().save(*args, **kwargs)
+    
+    def get_post_type(self):
+        """Get the type of the post this notification is about"""
+        return POST_KIND_TYPES.get(self.post_kind)
+    
+    def is_unread_for(self, read_at):
+        """Unread unless opened explicitly or older than the read watermark"""
+        return not self.is_read and (read_at is None or self.updated_at > read_at)
+    
+    @property
+    def other_actor_count(self):
+        """Actors in the group beyond the ones named in recent_actors"""
+        return max(self.actor_count - len(self.recent_actors), 0)
+    
+    @staticmethod
+    def load_recent_actors(notifications):
+        """Set recent_actor_users on each notification with one query for the whole page"""
+        notifications = list(notifications)
+        users = User.objects.in_bulk({user_id for n in notifications for user_id in n.recent_actors})
+        for notification in notifications:
+            notification.recent_actor_users = [
+                users[user_id] for user_id in notification.recent_actors if user_id in users
+            ] or [notification.actor]
+        return notifications
+    
+    @classmethod
+    def record(cls, recipient_id, notification_type, actor, post, comment=None):
+        """Add actor to the recipient's group for this post, creating it if needed"""
+        group = cls.objects.select_for_update().filter(
+            recipient_id=recipient_id, notification_type=notification_type, post=post
+        )
+        with transaction.atomic():
+            notification = group.first()
+            if notification is None:
+                # The post_save signal counts the new group as unread
+                try:
+                    with transaction.atomic():
+                        notification = cls.objects.create(
+                            recipient_id=recipient_id,
+                            notification_type=notification_type,
+                            actor=actor,
+                            post=post,
+                            comment=comment,
+                            recent_actors=[actor.id],
+                        )
+                        NotificationActor.objects.create(notification=notification, user=actor)
+                        return notification
+                except IntegrityError:
+                    # Another request created the group first
+                    notification = group.get()
+            
+            # The group row is locked, so the actor rows cannot race
+            _, added = NotificationActor.objects.update_or_create(
+                notification=notification, user=actor, defaults={'acted_at': timezone.now()}
+            )
+            if added:
+                notification.actor_count += 1
+            notification.recent_actors = [actor.id] + [
+                user_id for user_id in notification.recent_actors if user_id != actor.id
+            ][:cls.RECENT_ACTORS - 1]
+            # The group becomes unread again if it was read explicitly or
+            # sits under the recipient's read watermark
+            if notification.is_read:
+                notification.is_read = False
+                Profile.bump_unread(recipient_id, 1)
+            else:
+                Profile.bump_unread(recipient_id, 1, models.Q(notifications_read_at__gte=notification.updated_at))
+            notification.actor = actor
+            notification.comment = comment
+            notification.updated_at = timezone.now()
+            notification.save()
+            return notification
+    
+    @classmethod
+    def retract(cls, recipient_id, notification_type, actor, post):
+        """Remove actor from the group, deleting the group once it is empty"""
+        with transaction.atomic():
+            notification = cls.objects.select_for_update().filter(
+                recipient_id=recipient_id, notification_type=notification_type, post=post
+            ).first()
+            if notification is None:
+                return
+            removed, _ = NotificationActor.objects.filter(notification=notification, user=actor).delete()
+            if not removed:
+                return
+            if notification.actor_count <= 1:
+                notification.delete()
+                return
+            notification.actor_count -= 1
+            notification.recent_actors = [
+                user_id for user_id in notification.recent_actors if user_id != actor.id
+            ]
+            if notification.actor_id == actor.id:
+                # Fall back to the newest remaining actor
+                link = notification.actor_links.order_by('-acted_at', '-id').first()
+                if link is not None:
+                    notification.actor_id = link.user_id
+            notification.save()
+
+# One row per distinct user in a notification group, so acting twice
+# (like, unlike, like again) is only counted once
+class NotificationActor(models.Model):
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='actor_links')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    acted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'user'], name='notification_actor_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} in notification {self.notification_id}"
+
+# One row per (user, post) in a user's precomputed home timeline. Rows are
+# written in the background by posts.timeline, so the post link carries no
+# database constraint and a deleted post's rows are cleaned up afterwards.
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(BasePost, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    post_type = models.CharField(max_length=20, choices=POST_TYPES)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-created_at', '-post_type', '-post']
+        verbose_name_plural = 'timeline entries'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='timeline_user_post_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post_type', '-post'], name='timeline_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Post {self.post_id} in {self.user_id}'s timeline"
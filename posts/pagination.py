@@ -0,0 +1,62 @@
+"""
+Keyset pagination helpers.
+
+A cursor encodes the (timestamp, pk) of the last row on a page, so the next
+page is an index range scan instead of an OFFSET that grows with the page
+number.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """A page of rows plus the cursor for the following page"""
+
+    def __init__(self, rows, next_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(timestamp, pk):
+    micros = int(timestamp.timestamp() * 1_000_000)
+    return f'{micros}.{pk}'
+
+
+def decode_cursor(value):
+    """Parse a (timestamp, pk) cursor, returning None if it is missing or invalid"""
+    if not value:
+        return None
+    try:
+        micros, pk = value.split('.')
+        timestamp = datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc)
+        return timestamp, int(pk)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def keyset_page(queryset, cursor, page_size, field='created_at', descending=True):
+    """
+    Return one KeysetPage of queryset ordered by (field, pk).
+
+    cursor is a decoded (timestamp, pk) tuple or None for the first page.
+    """
+    if cursor is not None:
+        timestamp, pk = cursor
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': timestamp})
+            | Q(**{field: timestamp, f'pk__{lookup}': pk})
+        )
+    prefix = '-' if descending else ''
+    rows = list(queryset.order_by(f'{prefix}{field}', f'{prefix}pk')[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(getattr(rows[-1], field), rows[-1].pk)
+    return KeysetPage(rows, next_cursor)
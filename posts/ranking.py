@@ -0,0 +1,21 @@
+"""
+Hot ranking for community posts.
+
+A post's score is its engagement divided by a power of its age, so fresh
+activity outranks old totals. Scores are stored on the post by the
+update_hot_scores command and read back as an index scan.
+"""
+from django.utils import timezone
+
+GRAVITY = 1.5
+COMMENT_WEIGHT = 2
+
+# Posts older than this have decayed to roughly nothing and are not rescored
+RANKING_WINDOW_DAYS = 14
+
+
+def hot_score(like_count, comment_count, created_at, now=None):
+    now = now or timezone.now()
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    engagement = like_count + COMMENT_WEIGHT * comment_count + 1
+    return engagement / (age_hours + 2) ** GRAVITY
@@ -0,0 +1,153 @@
+"""
+Full-text search over posts of every type.
+
+The index lives next to the post table and depends on the database:
+
+* PostgreSQL: a ``search_vector`` tsvector column on the post table with a
+  GIN index, title weighted above content, ranked with ts_rank.
+* SQLite: an FTS5 table keyed by post id, ranked with bm25.
+* Anything else: a plain title/content scan, newest first.
+
+Both index structures are created by migration 0014 and kept current by
+the post signals, so searching never scans the post table.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import BasePost
+
+POST_TABLE = BasePost._meta.db_table
+FTS_TABLE = 'posts_search'
+
+
+class SearchBackend:
+    """Fallback backend with no index, used on unsupported databases"""
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def filter(self, queryset, query):
+        """Narrow a post queryset to every match, with no limit or ranking"""
+        for term in query.split():
+            queryset = queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        return queryset
+
+    def search(self, query, post_type=None, limit=20, offset=0):
+        """Return the ids of matching posts, best match first"""
+        queryset = self.filter(BasePost.objects.all(), query)
+        if post_type:
+            queryset = queryset.filter(post_type=post_type)
+        return list(queryset.order_by('-created_at', '-pk').values_list('pk', flat=True)[offset:offset + limit])
+
+
+class PostgresSearchBackend(SearchBackend):
+    vector_sql = (
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+    )
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {POST_TABLE} SET search_vector = {self.vector_sql} WHERE id = %s',
+                [post.pk],
+            )
+
+    def remove_post(self, post_id):
+        # The vector is stored on the post row and goes away with it
+        pass
+
+    def filter(self, queryset, query):
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT id FROM {POST_TABLE} WHERE search_vector @@ websearch_to_tsquery('english', %s)",
+            [query],
+        ))
+
+    def search(self, query, post_type=None, limit=20, offset=0):
+        sql = (
+            f"SELECT id FROM {POST_TABLE}, websearch_to_tsquery('english', %s) query "
+            "WHERE search_vector @@ query"
+        )
+        params = [query]
+        if post_type:
+            sql += ' AND post_type = %s'
+            params.append(post_type)
+        sql += ' ORDER BY ts_rank(search_vector, query) DESC, id DESC LIMIT %s OFFSET %s'
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SQLiteSearchBackend(SearchBackend):
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, content, post_type) VALUES (%s, %s, %s, %s)',
+                [post.pk, post.title, post.content, post.post_type],
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def filter(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+
+    def search(self, query, post_type=None, limit=20, offset=0):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [match]
+        if post_type:
+            sql += ' AND post_type = %s'
+            params.append(post_type)
+        # Title matches count ten times as much as content matches
+        sql += f' ORDER BY bm25({FTS_TABLE}, 10.0, 1.0, 0.0), rowid DESC LIMIT %s OFFSET %s'
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def match_expression(query):
+        """Quote each word so user input is never parsed as FTS5 syntax; the last word matches as a prefix"""
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return ''
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, SearchBackend)()
+
+
+def search_posts(query, post_type=None, limit=20, offset=0):
+    """
+    Return matching posts in rank order with their authors loaded.
+
+    One query against the search index, one for the posts themselves.
+    """
+    ids = get_backend().search(query, post_type=post_type, limit=limit, offset=offset)
+    posts = BasePost.objects.select_related('author__profile').in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,113 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from users.models import Profile, UserStats
+from . import announcements, timeline
+from .search import get_backend as get_search_backend
+from .models import BasePost, Comment, Notification, POST_MODELS, TimelineEntry
+
+# Sent by posts.likes.toggle_like with post_id and user arguments
+post_liked = Signal()
+post_unliked = Signal()
+
+# Proxy models send model signals under their own class, so post receivers
+# are connected for the base model and every proxy
+POST_SENDERS = (BasePost,) + tuple(POST_MODELS.values())
+
+def post_receiver(signal):
+    def decorator(func):
+        for sender in POST_SENDERS:
+            signal.connect(func, sender=sender)
+        return func
+    return decorator
+
+# Counters move in the model signals on both sides, so comments added or
+# removed outside the views (admin, shell, fixtures) keep them in step
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    if instance.post_id:
+        BasePost.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') + 1)
+    if instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id).update(reply_count=F('reply_count') + 1)
+    UserStats.bump(instance.author_id, comments_written=1)
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    if instance.post_id:
+        BasePost.objects.filter(pk=instance.post_id, comment_count__gt=0).update(comment_count=F('comment_count') - 1)
+    if instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id, reply_count__gt=0).update(reply_count=F('reply_count') - 1)
+    UserStats.bump(instance.author_id, comments_written=-1)
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        Profile.bump_unread(instance.recipient_id, 1)
+
+@receiver(post_delete, sender=Notification)
+def uncount_unread_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        Profile.bump_unread(instance.recipient_id, -1, Profile.read_before(instance.updated_at))
+
+@post_receiver(post_save)
+def count_post_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.bump(instance.author_id, post_count=1)
+
+@post_receiver(post_delete)
+def count_post_deleted(sender, instance, **kwargs):
+    UserStats.bump(instance.author_id, post_count=-1, likes_received=-instance.like_count)
+
+@post_receiver(post_save)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created and timeline.fanout_enabled():
+        timeline.run_after_commit(timeline.fan_out_post, instance.pk)
+
+@post_receiver(post_delete)
+def remove_from_timelines(sender, instance, **kwargs):
+    # Even with fan-out off, entries from an earlier fan-out period may remain
+    if TimelineEntry.objects.filter(post_id=instance.pk).exists():
+        timeline.remove_post_after_commit(instance.pk)
+
+@post_receiver(post_save)
+def index_post_for_search(sender, instance, **kwargs):
+    get_search_backend().index_post(instance)
+
+@post_receiver(post_delete)
+def remove_post_from_search(sender, instance, **kwargs):
+    get_search_backend().remove_post(instance.pk)
+
+@post_receiver(post_save)
+@post_receiver(post_delete)
+def invalidate_announcements(sender, instance, **kwargs):
+    if instance.post_type == 'announcement':
+        announcements.invalidate()
+
+@receiver(post_save, sender=User)
+def build_new_user_timeline(sender, instance, created, **kwargs):
+    if created and timeline.fanout_enabled():
+        timeline.run_after_commit(timeline.rebuild_timeline, [instance.pk])
+
+@receiver(post_liked)
+def count_like_received(sender, post_id, user, **kwargs):
+    author_id = BasePost.objects.filter(pk=post_id).values_list('author_id', flat=True).first()
+    if author_id:
+        UserStats.bump(author_id, likes_received=1)
+
+@receiver(post_unliked)
+def count_like_removed(sender, post_id, user, **kwargs):
+    author_id = BasePost.objects.filter(pk=post_id).values_list('author_id', flat=True).first()
+    if author_id:
+        UserStats.bump(author_id, likes_received=-1)
+
+@receiver(pre_delete, sender=User)
+def remove_likes_by_user(sender, instance, **kwargs):
+    # A deleted user's likes cascade away without post_unliked, so take them
+    # off the liked posts and their authors' totals first
+    liked = BasePost.objects.filter(likes=instance).exclude(author=instance)
+    for author_id, likes in liked.values('author_id').annotate(likes=Count('id')).values_list('author_id', 'likes'):
+        UserStats.bump(author_id, likes_received=-likes)
+    BasePost.objects.filter(pk__in=liked.values('pk'), like_count__gt=0).update(like_count=F('like_count') - 1)
@@ -1,3 +1,275 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.forms import modelform_factory
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from users.models import UserStats
+from . import announcements, timeline
+from .feed import FeedCursor, get_feed_page
+from .likes import toggle_like
+from .ranking import hot_score
+from .search import SearchBackend, get_backend as get_search_backend, search_posts
+from .models import AnnouncementPost, BasePost, Comment, CommunityPost, NormalPost, Notification, TimelineEntry
+
+
+class FeedPageTests(TestCase):
+
+    def test_pages_split_posts_with_equal_created_at(self):
+        author = User.objects.create_user('author', password='pw')
+        for i in range(3):
+            NormalPost.objects.create(title=f'Normal {i}', content='Body', author=author)
+            AnnouncementPost.objects.create(title=f'Event {i}', content='Body', author=author, event_date=timezone.now())
+            CommunityPost.objects.create(title=f'Topic {i}', content='Body', author=author)
+        created_at = timezone.now()
+        for model in (NormalPost, AnnouncementPost, CommunityPost):
+            model.objects.update(created_at=created_at)
+
+        seen = []
+        cursor = None
+        while True:
+            page = get_feed_page(cursor, page_size=2)
+            seen += [(post.get_post_type(), post.pk) for post in page.posts]
+            if not page.has_next:
+                break
+            cursor = FeedCursor.decode(page.next_cursor)
+
+        # Ties on created_at fall back to (post_type, pk), newest first
+        self.assertEqual(len(seen), 9)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+
+class CommentCounterTests(TestCase):
+
+    def test_counters_follow_comments_created_outside_views(self):
+        author = User.objects.create_user('author', password='pw')
+        post = NormalPost.objects.create(title='Hello', content='World', author=author)
+        comment = Comment.objects.create(post=post, author=author, content='Top')
+        reply = Comment.objects.create(post=post, author=author, content='Reply', parent=comment)
+
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(comment.reply_count, 1)
+        self.assertEqual(UserStats.objects.get(user=author).comments_written, 2)
+
+        reply.delete()
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((post.comment_count, comment.reply_count), (1, 0))
+        self.assertEqual(UserStats.objects.get(user=author).comments_written, 1)
+
+    def test_post_kind_is_derived_from_the_post(self):
+        author = User.objects.create_user('author', password='pw')
+        post = CommunityPost.objects.create(title='Hello', content='World', author=author)
+        comment = Comment(post=post, author=author, content='Hi', post_kind=1)
+        comment.save()
+        self.assertEqual(Comment.objects.get(pk=comment.pk).get_post_type(), 'community')
+        self.assertNotIn('post_kind', modelform_factory(Comment, fields='__all__')().fields)
+
+
+class ToggleLikeTests(TestCase):
+
+    def setUp(self):
+        self.fan = User.objects.create_user('fan', password='pw')
+        author = User.objects.create_user('author', password='pw')
+        self.post = NormalPost.objects.create(title='Hello', content='World', author=author)
+
+    def test_like_then_unlike(self):
+        self.assertEqual(toggle_like(self.post.pk, self.fan), (True, True, 1))
+        self.assertEqual(toggle_like(self.post.pk, self.fan), (False, True, 0))
+        self.assertFalse(self.post.likes.exists())
+
+    def test_concurrent_like_is_not_counted_twice(self):
+        # Another request's like commits after our DELETE found nothing,
+        # so our INSERT hits the unique constraint
+        Like = BasePost.likes.through
+        Like.objects.create(basepost_id=self.post.pk, user_id=self.fan.pk)
+        with mock.patch('django.db.models.query.QuerySet.delete', return_value=(0, {})):
+            result = toggle_like(self.post.pk, self.fan)
+
+        self.assertEqual(result, (True, False, 0))
+        self.assertEqual(Like.objects.filter(basepost_id=self.post.pk, user_id=self.fan.pk).count(), 1)
+
+
+@override_settings(TIMELINE_MAX_ENTRIES=8)
+class TimelinePageTests(TestCase):
+
+    def test_pages_continue_past_timeline_cap(self):
+        reader = User.objects.create_user('reader', password='pw')
+        author = User.objects.create_user('writer', password='pw')
+        for i in range(21):
+            NormalPost.objects.create(title=f'Post {i}', content='Body', author=author)
+        timeline.rebuild_timeline([reader.pk])
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 8)
+
+        seen = []
+        cursor = None
+        while True:
+            page = timeline.get_timeline_page(reader, cursor, page_size=5)
+            seen += [post.pk for post in page.posts]
+            if not page.has_next:
+                break
+            cursor = FeedCursor.decode(page.next_cursor)
+
+        expected = list(BasePost.objects.order_by('-created_at', '-post_type', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_only_posts_with_entries_are_queued_for_removal(self):
+        reader = User.objects.create_user('reader', password='pw')
+        author = User.objects.create_user('writer', password='pw')
+        NormalPost.objects.create(title='Not fanned out', content='Body', author=author)
+        post = NormalPost.objects.create(title='Fanned out', content='Body', author=author)
+        TimelineEntry.objects.create(user=reader, post=post, post_type=post.post_type, created_at=post.created_at)
+
+        with mock.patch.object(timeline, 'remove_post_after_commit') as queued:
+            author.delete()
+        queued.assert_called_once_with(post.pk)
+
+        timeline.remove_posts([post.pk])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user('author', password='pw')
+        self.in_content = NormalPost.objects.create(title='Weekend', content='Notes on gardening', author=author)
+        self.in_title = NormalPost.objects.create(title='Gardening tips', content='Start small', author=author)
+        self.topic = CommunityPost.objects.create(title='Gardening club', content='Who is in?', author=author)
+        NormalPost.objects.create(title='Cooking', content='Soup', author=author)
+
+    def test_index_ranks_title_matches_first(self):
+        results = search_posts('gardening', post_type='normal')
+        self.assertEqual(results, [self.in_title, self.in_content])
+
+    def test_index_follows_edits_deletes_and_prefixes(self):
+        self.in_title.title = 'Planting tips'
+        self.in_title.save()
+        self.in_content.delete()
+        self.assertEqual(search_posts('garden'), [self.topic])
+        # Search syntax in user input is matched literally
+        self.assertEqual(search_posts('(planting" tips'), [self.in_title])
+
+    def test_fallback_backend_scans_newest_first(self):
+        ids = SearchBackend().search('gardening')
+        self.assertEqual(ids, [self.topic.pk, self.in_title.pk, self.in_content.pk])
+
+    def test_filter_is_not_capped(self):
+        author = self.topic.author
+        NormalPost.objects.bulk_create(
+            [NormalPost(title=f'Gardening {i}', content='More', author=author) for i in range(30)]
+        )
+        for post in NormalPost.objects.filter(title__startswith='Gardening '):
+            get_search_backend().index_post(post)
+        for backend in (get_search_backend(), SearchBackend()):
+            self.assertEqual(backend.filter(NormalPost.objects.all(), 'gardening').count(), 32)
+
+
+class HotScoreTests(TestCase):
+
+    def test_fresh_activity_outranks_old_totals(self):
+        now = timezone.now()
+        fresh = hot_score(5, 1, now - timedelta(hours=1), now)
+        old = hot_score(50, 10, now - timedelta(days=3), now)
+        self.assertGreater(fresh, old)
+
+    def test_trending_lists_scored_posts_best_first(self):
+        author = User.objects.create_user('author', password='pw')
+        now = timezone.now()
+        old = CommunityPost.objects.create(title='Old favourite', content='Body', author=author, category='events')
+        fresh = CommunityPost.objects.create(title='Fresh', content='Body', author=author, category='events')
+        quiet = CommunityPost.objects.create(title='Quiet', content='Body', author=author, category='general')
+        expired = CommunityPost.objects.create(title='Expired', content='Body', author=author, category='events')
+        CommunityPost.objects.filter(pk=old.pk).update(created_at=now - timedelta(days=2), like_count=40)
+        CommunityPost.objects.filter(pk=fresh.pk).update(like_count=3)
+        CommunityPost.objects.filter(pk=expired.pk).update(created_at=now - timedelta(days=30), hot_score=5)
+
+        call_command('update_hot_scores', stdout=StringIO())
+
+        self.assertEqual(CommunityPost.objects.get(pk=expired.pk).hot_score, 0)
+        self.client.force_login(author)
+        response = self.client.get(reverse('trending'))
+        self.assertEqual(list(response.context['posts']), [fresh, quiet, old])
+        response = self.client.get(reverse('trending-category', args=['events']))
+        self.assertEqual(list(response.context['posts']), [fresh, old])
+
+
+@override_settings(ANNOUNCEMENT_CACHE_TIMEOUT=60)
+class AnnouncementCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user('author', password='pw')
+
+    def announce(self, title, starts_in):
+        return AnnouncementPost.objects.create(
+            title=title, content='Body', author=self.author, event_date=timezone.now() + starts_in
+        )
+
+    def cached_timeout(self):
+        with mock.patch.object(announcements.cache, 'set', wraps=announcements.cache.set) as cache_set:
+            cache.delete(announcements.CACHE_KEY)
+            announcements.get_upcoming_announcements()
+        return cache_set.call_args.args[2]
+
+    def test_entry_expires_when_first_event_starts(self):
+        self.announce('Later', timedelta(hours=1))
+        self.assertEqual(self.cached_timeout(), 60)
+        self.announce('Soon', timedelta(seconds=20))
+        self.assertLessEqual(self.cached_timeout(), 20)
+
+    def test_saving_an_announcement_invalidates(self):
+        first = self.announce('First', timedelta(days=1))
+        self.assertEqual(announcements.get_upcoming_announcements(), [first])
+        with self.assertNumQueries(0):
+            announcements.get_upcoming_announcements()
+
+        second = self.announce('Second', timedelta(hours=1))
+        self.assertEqual(announcements.get_upcoming_announcements(), [second, first])
+        first.delete()
+        self.assertEqual(announcements.get_upcoming_announcements(), [second])
+        self.assertEqual(announcements.get_stats()['hits'], 1)
+
+
+class NotificationGroupTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='pw')
+        self.fan = User.objects.create_user('fan', password='pw')
+        self.other = User.objects.create_user('other', password='pw')
+        self.post = NormalPost.objects.create(title='Hello', content='World', author=self.author)
+
+    def test_repeat_actor_counted_once(self):
+        Notification.record(self.author.pk, 'like', self.fan, self.post)
+        Notification.record(self.author.pk, 'like', self.other, self.post)
+        Notification.retract(self.author.pk, 'like', self.fan, self.post)
+        Notification.record(self.author.pk, 'like', self.fan, self.post)
+        Notification.record(self.author.pk, 'like', self.fan, self.post)
+
+        notification = Notification.objects.get(recipient=self.author, notification_type='like')
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.recent_actors, [self.fan.pk, self.other.pk])
+
+    def test_recent_actors_follow_renames(self):
+        notification = Notification.record(self.author.pk, 'like', self.fan, self.post)
+        User.objects.filter(pk=self.fan.pk).update(username='renamed')
+        [notification] = Notification.load_recent_actors([notification])
+        self.assertEqual([user.username for user in notification.recent_actor_users], ['renamed'])
+
+    def test_deleting_comment_keeps_group(self):
+        first = Comment.objects.create(post=self.post, author=self.fan, content='First')
+        Notification.record(self.author.pk, 'comment', self.fan, self.post, comment=first)
+        second = Comment.objects.create(post=self.post, author=self.other, content='Second')
+        Notification.record(self.author.pk, 'comment', self.other, self.post, comment=second)
+
+        second.delete()
+
+        notification = Notification.objects.get(recipient=self.author, notification_type='comment')
+        self.assertIsNone(notification.comment_id)
+        self.assertEqual(notification.actor_count, 2)
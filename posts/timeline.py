@@ -0,0 +1,182 @@
+"""
+Fan-out-on-write home timelines.
+
+When TIMELINE_FANOUT is on, every new post is copied as a small
+TimelineEntry row into the timeline of each active user, and the home feed
+reads a slice of the viewer's own rows instead of merging the post table.
+Timelines are trimmed to TIMELINE_MAX_ENTRIES rows per user.
+
+Once the audience grows past TIMELINE_FANOUT_MAX_AUDIENCE users, writing a
+row per user stops paying off, so both writers and readers fall back to
+pull mode (posts.feed). Run ``manage.py rebuild_timelines`` after turning
+fan-out back on.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .feed import FEED_FIELDS, FeedCursor, make_page, pull_posts
+from .models import BasePost, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+AUDIENCE_CACHE_KEY = 'timeline:audience'
+AUDIENCE_CACHE_TIMEOUT = 600
+
+ENTRY_ORDERING = ('-created_at', '-post_type', '-post_id')
+
+# Deleted posts waiting for their timeline entries to be removed
+_removal_queue = set()
+_removal_lock = threading.Lock()
+_removal_thread = None
+
+
+def audience():
+    """Users whose timelines receive every new post"""
+    return User.objects.filter(is_active=True)
+
+
+def fanout_enabled():
+    """True when timelines should be written and read instead of pulling the feed"""
+    if not settings.TIMELINE_FANOUT:
+        return False
+    size = cache.get_or_set(AUDIENCE_CACHE_KEY, lambda: audience().count(), AUDIENCE_CACHE_TIMEOUT)
+    return size <= settings.TIMELINE_FANOUT_MAX_AUDIENCE
+
+
+def run_after_commit(func, *args):
+    """Run func(*args) in a background thread once the current transaction commits"""
+    def start():
+        threading.Thread(target=_run_in_background, args=(func, *args), daemon=True).start()
+    transaction.on_commit(start)
+
+
+def _run_in_background(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Timeline task %s%r failed', func.__name__, args)
+    finally:
+        close_old_connections()
+
+
+def fan_out_post(post_id, batch_size=1000):
+    """Add a post to the timeline of every user in the audience"""
+    post = BasePost.objects.filter(pk=post_id).only('id', 'post_type', 'created_at').first()
+    if post is None:
+        return
+    user_ids = audience().order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    batch = []
+    for user_id in user_ids:
+        batch.append(TimelineEntry(user_id=user_id, post_id=post.pk, post_type=post.post_type, created_at=post.created_at))
+        if len(batch) >= batch_size:
+            _write_entries(batch)
+            batch = []
+    if batch:
+        _write_entries(batch)
+
+
+def _write_entries(entries):
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    trim_timelines({entry.user_id for entry in entries})
+
+
+def remove_post_after_commit(post_id):
+    """
+    Queue a deleted post's entries for removal once the transaction commits.
+
+    Removals share one background thread that deletes queued posts in
+    batches, so a cascade deleting many posts does not start a thread each.
+    """
+    transaction.on_commit(lambda: _queue_removal(post_id))
+
+
+def _queue_removal(post_id):
+    global _removal_thread
+    with _removal_lock:
+        _removal_queue.add(post_id)
+        if _removal_thread is None:
+            _removal_thread = threading.Thread(target=_run_in_background, args=(_drain_removals,), daemon=True)
+            _removal_thread.start()
+
+
+def _drain_removals():
+    global _removal_thread
+    while True:
+        with _removal_lock:
+            post_ids = list(_removal_queue)
+            _removal_queue.clear()
+            if not post_ids:
+                _removal_thread = None
+                return
+        try:
+            remove_posts(post_ids)
+        except Exception:
+            logger.exception('Removing posts %r from timelines failed', post_ids)
+
+
+def remove_posts(post_ids, batch_size=500):
+    """Remove deleted posts from every timeline"""
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), batch_size):
+        TimelineEntry.objects.filter(post_id__in=post_ids[start:start + batch_size]).delete()
+
+
+def trim_timelines(user_ids):
+    """Delete entries beyond the newest TIMELINE_MAX_ENTRIES for each user"""
+    ranked = TimelineEntry.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(RowNumber(), partition_by=[F('user_id')], order_by=[F(field[1:]).desc() for field in ENTRY_ORDERING]),
+    ).filter(position__gt=settings.TIMELINE_MAX_ENTRIES)
+    stale = list(ranked.values_list('pk', flat=True))
+    if stale:
+        TimelineEntry.objects.filter(pk__in=stale).delete()
+
+
+def rebuild_timeline(user_ids):
+    """Replace the timelines of the given users with the newest posts"""
+    posts = list(
+        BasePost.objects.order_by('-created_at', '-post_type', '-pk')
+        .values_list('pk', 'post_type', 'created_at')[:settings.TIMELINE_MAX_ENTRIES]
+    )
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(user_id=user_id, post_id=pk, post_type=post_type, created_at=created_at)
+                for user_id in user_ids
+                for pk, post_type, created_at in posts
+            ],
+            batch_size=1000,
+        )
+    return len(posts)
+
+
+def get_timeline_page(user, cursor=None, page_size=5):
+    """
+    Return one page of a user's precomputed timeline as a FeedPage, or None
+    if the user has no timeline yet and the caller should pull instead.
+
+    Entries and their posts come from one joined query, plus one for authors.
+    Timelines keep only TIMELINE_MAX_ENTRIES rows, so once they run out the
+    page is filled from the pull feed, which uses the same cursor order.
+    """
+    entries = TimelineEntry.objects.filter(user=user).select_related('post').only(
+        'post_id', 'post_type', 'created_at', *(f'post__{field}' for field in FEED_FIELDS)
+    )
+    if cursor is not None:
+        entries = entries.filter(cursor.as_filter(pk_field='post_id'))
+    entries = list(entries.order_by(*ENTRY_ORDERING)[:page_size + 1])
+    if not entries and cursor is None:
+        return None
+    posts = [entry.post for entry in entries]
+    if len(posts) <= page_size:
+        tail = FeedCursor.for_post(posts[-1]) if posts else cursor
+        posts += pull_posts(tail, page_size + 1 - len(posts))
+    return make_page(posts, page_size)
@@ -2,7 +2,7 @@ from django.urls import path
 from . import views
 from .views import (
     PostListView, PostDetailView, PostCreateView,
-    PostUpdateView, PostDeleteView, UserPostListView
+    PostUpdateView, PostDeleteView, UserPostListView, TrendingPostListView
 )
 
 urlpatterns = [
@@ -34,12 +34,25 @@ urlpatterns = [
     path('home/post/<str:post_type>/<int:pk>/update/', PostUpdateView.as_view(), name='home-post-update'),
     path('home/post/<str:post_type>/<int:pk>/delete/', PostDeleteView.as_view(), name='home-post-delete'),
     
+    # Trending community posts
+    path('trending/', TrendingPostListView.as_view(), name='trending'),
+    path('trending/<str:category>/', TrendingPostListView.as_view(), name='trending-category'),
+    
+    # Search
+    path('search/', views.search, name='post-search'),
+    
+    # Cache statistics for staff
+    path('cache-stats/', views.cache_stats, name='cache-stats'),
+    
     # Comments and likes
     path('home/post/<str:post_type>/<int:pk>/comment/', views.add_comment, name='add-comment'),
     path('home/post/<str:post_type>/<int:pk>/like/', views.like_post, name='like-post'),
+    path('home/post/<str:post_type>/<int:pk>/comments/', views.comment_list, name='comment-list'),
+    path('comments/<int:comment_id>/replies/', views.comment_replies, name='comment-replies'),
     
     # Notifications
     path('notifications/', views.notifications, name='notifications'),
+    path('notifications/page/', views.notifications_json, name='notifications-json'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark-notification-read'),
     path('notifications/<int:notification_id>/mark-read/', views.mark_notification_read_ajax, name='mark-notification-read-ajax'),
     
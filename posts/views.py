@@ -1,21 +1,28 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView
 )
 from django.urls import reverse_lazy, reverse
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.utils import timezone
 from django.db.models import Count, Q
-from django.contrib.sessions.models import Session
 from .models import (
     BasePost, NormalPost, AnnouncementPost, CommunityPost,
-    Comment, Notification
+    Comment, Notification, COMMUNITY_CATEGORIES, POST_MODELS, POST_TYPES, get_post_model
 )
 from .forms import NormalPostForm, AnnouncementPostForm, CommunityPostForm
+from .announcements import get_upcoming_announcements, get_stats as get_announcement_cache_stats
+from .feed import FeedCursor, get_feed_page
+from .timeline import fanout_enabled, get_timeline_page
+from .likes import mark_liked_by, toggle_like
+from .pagination import decode_cursor, keyset_page
+from .search import search_posts
 from django.contrib.auth.models import User
 from django.contrib import messages
+from users.models import Presence, Profile
 
 # Home view to display all posts
 class PostListView(LoginRequiredMixin, ListView):
@@ -25,56 +32,37 @@ class PostListView(LoginRequiredMixin, ListView):
     login_url = 'login'  # Redirect to login page if not authenticated
     
     def get_queryset(self):
-        # Get all posts, ordered by creation date
-        normal_posts = NormalPost.objects.all()
-        announcement_posts = AnnouncementPost.objects.all()
-        community_posts = CommunityPost.objects.all()
-        
-        # Combine and sort all posts
-        all_posts = list(normal_posts) + list(announcement_posts) + list(community_posts)
-        all_posts.sort(key=lambda x: x.created_at, reverse=True)
-        
-        return all_posts
+        # Read the viewer's precomputed timeline, or pull a page of the merged feed
+        cursor = FeedCursor.decode(self.request.GET.get('cursor'))
+        self.feed_page = None
+        if fanout_enabled():
+            self.feed_page = get_timeline_page(self.request.user, cursor, page_size=self.paginate_by)
+        if self.feed_page is None:
+            self.feed_page = get_feed_page(cursor, page_size=self.paginate_by)
+        return mark_liked_by(self.feed_page.posts, self.request.user)
+    
+    def get_paginate_by(self, queryset):
+        # The feed engine already returns exactly one page
+        return None
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get upcoming active announcements
-        context['announcements'] = AnnouncementPost.objects.filter(
-            is_active=True,
-            event_date__gte=timezone.now()
-        ).order_by('event_date')[:5]  # Limit to 5 upcoming events
-        
-        # Get currently logged in users (users with active sessions)
-        active_sessions = Session.objects.filter(expire_date__gte=timezone.now())
-        logged_in_user_ids = []
+        context['next_cursor'] = self.feed_page.next_cursor
+        context['is_first_page'] = not self.request.GET.get('cursor')
+        # Get upcoming active announcements from the cache
+        context['announcements'] = get_upcoming_announcements()
         
-        # Extract user IDs from session data
-        for session in active_sessions:
-            data = session.get_decoded()
-            user_id = data.get('_auth_user_id')
-            if user_id:
-                logged_in_user_ids.append(int(user_id))
+        # Get users seen recently, with their profile and activity stats
+        active_users = User.objects.filter(
+            presence__last_seen__gte=Presence.online_cutoff()
+        ).select_related('profile', 'stats').order_by('-presence__last_seen')[:10]  # Top 10 online users
         
-        # Get all users who are currently logged in
-        active_users = User.objects.filter(id__in=logged_in_user_ids).order_by('-last_login')[:10]  # Top 10 logged in users
-        
-        # Mark all as online and add total post count
+        # Mark all as online
         for user in active_users:
             user.is_online = True
-            # Count total posts
-            user.post_count = NormalPost.objects.filter(author=user).count() + \
-                           AnnouncementPost.objects.filter(author=user).count() + \
-                           CommunityPost.objects.filter(author=user).count()
         
         context['active_users'] = active_users
         
-        # Add unread notifications count for the current user
-        if self.request.user.is_authenticated:
-            context['unread_notifications_count'] = Notification.objects.filter(
-                recipient=self.request.user,
-                is_read=False
-            ).count()
-            
         return context
 
 # User's posts view
@@ -85,59 +73,68 @@ class UserPostListView(ListView):
     
     def get_queryset(self):
         user = get_object_or_404(User, username=self.kwargs.get('username'))
-        # Get all posts for the user
-        normal_posts = NormalPost.objects.filter(author=user)
-        announcement_posts = AnnouncementPost.objects.filter(author=user)
-        community_posts = CommunityPost.objects.filter(author=user)
-        
-        # Combine and sort all posts
-        all_posts = []
-        for post in list(normal_posts) + list(announcement_posts) + list(community_posts):
-            # Ensure post type is set
-            if not hasattr(post, 'post_type'):
-                if isinstance(post, NormalPost):
-                    post.post_type = 'normal'
-                elif isinstance(post, AnnouncementPost):
-                    post.post_type = 'announcement'
-                elif isinstance(post, CommunityPost):
-                    post.post_type = 'community'
-            all_posts.append(post)
-        
-        all_posts.sort(key=lambda x: x.created_at, reverse=True)
-        return all_posts
+        # Get all posts for the user, newest first
+        return BasePost.objects.filter(author=user).select_related('author__profile')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = get_object_or_404(User, username=self.kwargs.get('username'))
         context['user_profile'] = user.profile
+        # Resolve the viewer's likes for the current page in one query
+        context['posts'] = context['object_list'] = mark_liked_by(context['object_list'], self.request.user)
+        return context
+
+# Community posts ranked by hot score, optionally within one category
+class TrendingPostListView(LoginRequiredMixin, ListView):
+    template_name = 'posts/trending.html'
+    context_object_name = 'posts'
+    paginate_by = 5
+    login_url = 'login'
+    
+    def get_queryset(self):
+        category = self.kwargs.get('category')
+        queryset = CommunityPost.objects.filter(hot_score__gt=0)
+        if category:
+            if category not in dict(COMMUNITY_CATEGORIES):
+                raise Http404('Unknown category')
+            queryset = queryset.filter(category=category)
+        # Served straight from the (post_type, [category,] hot_score) indexes
+        return queryset.select_related('author__profile').order_by('-hot_score', '-id')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['posts'] = context['object_list'] = mark_liked_by(context['posts'], self.request.user)
+        context['categories'] = COMMUNITY_CATEGORIES
+        context['category'] = self.kwargs.get('category')
         return context
 
 # Post detail view
 class PostDetailView(DetailView):
     template_name = 'posts/post_detail.html'
+    comments_per_page = 20
     
     def get_queryset(self):
         # Get the specific post type based on URL parameter
-        post_type = self.kwargs.get('post_type')
-        if post_type == 'normal':
-            return NormalPost.objects.all()
-        elif post_type == 'announcement':
-            return AnnouncementPost.objects.all()
-        elif post_type == 'community':
-            return CommunityPost.objects.all()
-        return None
+        model = get_post_model(self.kwargs.get('post_type'), default=None)
+        if model is None:
+            raise Http404('Unknown post type')
+        # Load the author and their profile in the same query
+        return model.objects.select_related('author__profile')
     
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         post_type = self.kwargs.get('post_type')
         
-        # Get comments using post_id and post_type
-        context['comments'] = Comment.objects.filter(
-            post_id=self.object.id,
-            post_type=post_type
-        ).order_by('-created_at')
+        # Get one keyset page of top-level comments, newest first, with their
+        # authors. Replies are fetched on demand from comment_replies.
+        cursor = decode_cursor(self.request.GET.get('comments'))
+        page = keyset_page(top_level_comments(self.object.id), cursor, self.comments_per_page)
+        context['comments'] = page.rows
+        context['next_comments_cursor'] = page.next_cursor
+        context['is_first_comments_page'] = cursor is None
         context['post_type'] = post_type
+        mark_liked_by([self.object], self.request.user)
         context['post_type_display'] = self.object.get_post_type_display()
         return context
     
@@ -161,12 +158,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         return NormalPostForm
     
     def get_queryset(self):
-        post_type = self.kwargs.get('post_type')
-        if post_type == 'announcement':
-            return AnnouncementPost.objects.all()
-        elif post_type == 'community':
-            return CommunityPost.objects.all()
-        return NormalPost.objects.all()
+        return get_post_model(self.kwargs.get('post_type')).objects.all()
     
     def form_valid(self, form):
         post = form.save(commit=False)
@@ -174,15 +166,8 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         post.save()
         messages.success(self.request, 'Your post has been created!')
         
-        # Get the post_type from URL parameters
-        post_type = self.kwargs.get('post_type')
-        
         # Redirect to the correct post detail URL
-        if post_type == 'announcement':
-            return redirect('post-announcement-detail', pk=post.id, post_type='announcement')
-        elif post_type == 'community':
-            return redirect('post-community-detail', pk=post.id, post_type='community')
-        return redirect('post-normal-detail', pk=post.id, post_type='normal')
+        return redirect(post.get_detail_url(), **post.get_url_kwargs())
     
     def get_success_url(self):
         # If this was a modal submission, redirect back to home
@@ -197,21 +182,11 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     fields = ['title', 'content', 'image']
     
     def get_queryset(self):
-        post_type = self.kwargs.get('post_type')
-        if post_type == 'announcement':
-            return AnnouncementPost.objects.all()
-        elif post_type == 'community':
-            return CommunityPost.objects.all()
-        return NormalPost.objects.all()
+        return get_post_model(self.kwargs.get('post_type')).objects.all()
     
     def get_object(self, queryset=None):
-        post_type = self.kwargs.get('post_type')
-        pk = self.kwargs.get('pk')
-        if post_type == 'announcement':
-            return get_object_or_404(AnnouncementPost, pk=pk)
-        elif post_type == 'community':
-            return get_object_or_404(CommunityPost, pk=pk)
-        return get_object_or_404(NormalPost, pk=pk)
+        model = get_post_model(self.kwargs.get('post_type'))
+        return get_object_or_404(model, pk=self.kwargs.get('pk'))
     
     def test_func(self):
         post = self.get_object()
@@ -237,21 +212,11 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     template_name = 'posts/post_confirm_delete.html'
     
     def get_queryset(self):
-        post_type = self.kwargs.get('post_type')
-        if post_type == 'announcement':
-            return AnnouncementPost.objects.all()
-        elif post_type == 'community':
-            return CommunityPost.objects.all()
-        return NormalPost.objects.all()
+        return get_post_model(self.kwargs.get('post_type')).objects.all()
     
     def get_object(self, queryset=None):
-        post_type = self.kwargs.get('post_type')
-        pk = self.kwargs.get('pk')
-        if post_type == 'announcement':
-            return get_object_or_404(AnnouncementPost, pk=pk)
-        elif post_type == 'community':
-            return get_object_or_404(CommunityPost, pk=pk)
-        return get_object_or_404(NormalPost, pk=pk)
+        model = get_post_model(self.kwargs.get('post_type'))
+        return get_object_or_404(model, pk=self.kwargs.get('pk'))
     
     def test_func(self):
         post = self.get_object()
@@ -267,7 +232,7 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         messages.success(request, 'Post has been deleted successfully.')
         return redirect(success_url)
 
-# Add comment to post
+# Add comment or reply to post
 @login_required
 def add_comment(request, pk, post_type):
     if request.method == 'POST':
@@ -276,104 +241,212 @@ def add_comment(request, pk, post_type):
             messages.error(request, 'Comment cannot be empty!')
             return redirect('home-post-detail', pk=pk, post_type=post_type)
         
-        if post_type == 'announcement':
-            post = get_object_or_404(AnnouncementPost, pk=pk)
-        elif post_type == 'community':
-            post = get_object_or_404(CommunityPost, pk=pk)
-        else:
-            post = get_object_or_404(NormalPost, pk=pk)
+        post = get_object_or_404(get_post_model(post_type), pk=pk)
+        
+        parent_id = None
+        if request.POST.get('parent', '').isdigit():
+            parent = get_object_or_404(
+                Comment.objects.only('id', 'parent_id'), pk=request.POST['parent'], post_id=post.pk
+            )
+            # Keep threads one level deep by replying to the top-level comment
+            parent_id = parent.parent_id or parent.pk
         
         comment = Comment.objects.create(
             content=content,
             author=request.user,
-            post_id=post.pk,
-            post_type=post_type
+            post=post,
+            parent_id=parent_id
         )
         
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                notification_type='comment',
-                actor=request.user,
-                post_id=post.pk,
-                post_type=post_type,
-                comment=comment
-            )
+        if post.author_id != request.user.id:
+            Notification.record(post.author_id, 'comment', request.user, post, comment=comment)
         
         messages.success(request, 'Comment added successfully!')
         return redirect('home-post-detail', pk=pk, post_type=post_type)
     return redirect('home')
 
+def top_level_comments(post_id):
+    return Comment.objects.filter(post_id=post_id, parent__isnull=True).select_related('author__profile')
+
+def comment_page_json(page):
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.id,
+                'author': comment.author.username,
+                'author_image': comment.author.profile.image_url,
+                'author_url': reverse('user-posts', args=[comment.author.username]),
+                'content': comment.content,
+                'created_at': comment.created_at.isoformat(),
+                'reply_count': comment.reply_count,
+            }
+            for comment in page.rows
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+# JSON page of a post's top-level comments, newest first
+def comment_list(request, pk, post_type):
+    post_model = get_post_model(post_type, default=None)
+    if post_model is None:
+        raise Http404('Unknown post type')
+    post = get_object_or_404(post_model.objects.only('id'), pk=pk)
+    cursor = decode_cursor(request.GET.get('cursor'))
+    page = keyset_page(top_level_comments(post.pk), cursor, PostDetailView.comments_per_page)
+    return comment_page_json(page)
+
+# JSON page of replies to a comment, oldest first
+def comment_replies(request, comment_id):
+    parent = get_object_or_404(Comment.objects.only('id'), pk=comment_id)
+    replies = Comment.objects.filter(parent_id=parent.pk).select_related('author__profile')
+    cursor = decode_cursor(request.GET.get('cursor'))
+    page = keyset_page(replies, cursor, PostDetailView.comments_per_page, descending=False)
+    return comment_page_json(page)
+
 # Like/unlike post
 @login_required
 def like_post(request, pk, post_type):
     # Get the appropriate post model based on post_type
-    if post_type == 'announcement':
-        post = get_object_or_404(AnnouncementPost, pk=pk)
-    elif post_type == 'community':
-        post = get_object_or_404(CommunityPost, pk=pk)
-    else:
-        post = get_object_or_404(NormalPost, pk=pk)
-    
-    if request.user in post.likes.all():
-        post.likes.remove(request.user)
-        liked = False
-        
-        # Remove any existing like notification
-        Notification.objects.filter(
-            recipient=post.author,
-            notification_type='like',
-            actor=request.user,
-            post=post
-        ).delete()
-    else:
-        post.likes.add(request.user)
-        liked = True
-        
-        # Create notification for post owner (if not the same as like author)
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                notification_type='like',
-                actor=request.user,
-                post=post
-            )
+    post = get_object_or_404(get_post_model(post_type).objects.only('id', 'post_type', 'author_id'), pk=pk)
+    
+    result = toggle_like(post.pk, request.user)
+    
+    # Keep the post owner's grouped like notification in step (not for own likes)
+    if result.changed and post.author_id != request.user.id:
+        if result.liked:
+            Notification.record(post.author_id, 'like', request.user, post)
+        else:
+            Notification.retract(post.author_id, 'like', request.user, post)
     
     return JsonResponse({
-        'liked': liked,
-        'count': post.get_like_count()
+        'liked': result.liked,
+        'count': result.like_count
     })
 
+# Search posts of every type
+@login_required
+def search(request):
+    per_page = 10
+    query = request.GET.get('q', '').strip()
+    post_type = request.GET.get('type')
+    if post_type not in POST_MODELS:
+        post_type = None
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    
+    posts = []
+    has_next = False
+    if query:
+        # Fetch one extra result to know whether there is a next page
+        posts = search_posts(query, post_type=post_type, limit=per_page + 1, offset=(page - 1) * per_page)
+        has_next = len(posts) > per_page
+        posts = mark_liked_by(posts[:per_page], request.user)
+    
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'post_type': post_type,
+        'post_types': POST_TYPES,
+        'posts': posts,
+        'page': page,
+        'has_next': has_next,
+    })
+
+# Cache hit and miss totals for tuning
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse({'announcements': get_announcement_cache_stats()})
+
+NOTIFICATIONS_PER_PAGE = 20
+
+def notification_page(request):
+    """
+    One keyset page of the user's notification groups, most recently updated first.
+    
+    updated_at moves whenever a group gains an actor, so a group that
+    changes while the user is paging jumps above the cursor: it is missed
+    by later pages until the user reloads (it is then at the top) and may
+    repeat, which the infinite-scroll script filters out. Accepted in
+    exchange for recency order.
+    """
+    notifications_list = Notification.objects.filter(recipient=request.user).select_related(
+        'actor__profile', 'post'
+    ).only(
+        'id', 'notification_type', 'recent_actors', 'actor_count', 'updated_at', 'is_read',
+        'post_id', 'post_kind', 'post__title', 'actor__username', 'actor__profile__image',
+    )
+    cursor = decode_cursor(request.GET.get('cursor'))
+    page = keyset_page(notifications_list, cursor, NOTIFICATIONS_PER_PAGE, field='updated_at')
+    read_at = request.user.profile.notifications_read_at
+    Notification.load_recent_actors(page.rows)
+    for notification in page.rows:
+        notification.is_unread = notification.is_unread_for(read_at)
+    return page
+
 # Notifications view
 @login_required
 def notifications(request):
-    # Get all notifications for the current user
-    notifications_list = Notification.objects.filter(recipient=request.user).order_by('-created_at')
-    
-    # Mark all as read if requested
+    # Mark all as read if requested by moving the read watermark
     if request.GET.get('mark_all_read'):
-        notifications_list.update(is_read=True)
+        Profile.mark_notifications_read(request.user.id)
         messages.success(request, 'All notifications marked as read.')
         return redirect('notifications')
     
-    return render(request, 'posts/notifications.html', {'notifications': notifications_list})
+    page = notification_page(request)
+    return render(request, 'posts/notifications.html', {
+        'notifications': page.rows,
+        'next_cursor': page.next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    })
+
+# JSON page of notifications for infinite scroll
+@login_required
+def notifications_json(request):
+    page = notification_page(request)
+    return JsonResponse({
+        'notifications': [
+            {
+                'id': notification.id,
+                'type': notification.notification_type,
+                'actors': [
+                    {'username': user.username, 'url': reverse('user-posts', args=[user.username])}
+                    for user in notification.recent_actor_users
+                ],
+                'other_actor_count': notification.other_actor_count,
+                'actor_image': notification.actor.profile.image_url,
+                'post_title': notification.post.title if notification.post_id else '',
+                'url': reverse('mark-notification-read', args=[notification.id]),
+                'updated_at': notification.updated_at.isoformat(),
+                'is_unread': notification.is_unread,
+            }
+            for notification in page.rows
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+def mark_read(notification):
+    # Only the request that flips the flag decrements the counter
+    if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+        Profile.bump_unread(notification.recipient_id, -1, Profile.read_before(notification.updated_at))
+    notification.is_read = True
 
 # Mark notification as read
 @login_required
 def mark_notification_read(request, notification_id):
     notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
-    notification.is_read = True
-    notification.save()
+    mark_read(notification)
     
     # Redirect to the post that the notification is about
-    return redirect('post-detail', pk=notification.post.pk)
+    if not notification.post_id:
+        return redirect('notifications')
+    return redirect('home-post-detail', post_type=notification.get_post_type(), pk=notification.post_id)
 
 # AJAX endpoint to mark notification as read
 @login_required
 def mark_notification_read_ajax(request, notification_id):
     if request.method == 'POST':
         notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
-        notification.is_read = True
-        notification.save()
+        mark_read(notification)
         return JsonResponse({'success': True})
     return JsonResponse({'success': False}, status=400)
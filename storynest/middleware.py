@@ -3,8 +3,10 @@ Custom middleware for the social media application.
 """
 import re
 from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse
 from django.views.static import serve
+from users.models import Presence
 
 class AdminStaticFilesMiddleware:
     """
@@ -59,3 +61,22 @@ class AdminStaticFilesMiddleware:
         
         # Continue with normal request processing
         return self.get_response(request)
+
+class PresenceMiddleware:
+    """
+    Record when authenticated users were last seen.
+
+    A cache key per user throttles the write to one per
+    PRESENCE_UPDATE_INTERVAL seconds, so busy users do not turn every
+    request into a database write.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            # cache.add only succeeds when the throttle key has expired
+            if cache.add(f'presence:{user.pk}', True, settings.PRESENCE_UPDATE_INTERVAL):
+                Presence.touch(user.pk)
+        return self.get_response(request)
@@ -48,7 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
-    'chat',
+    'chat.apps.ChatConfig',
     'site_config.apps.SiteConfigConfig',
     'crispy_forms',
     'crispy_bootstrap5',
@@ -62,6 +62,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Records last-seen times for the "online now" sidebar
+    'storynest.middleware.PresenceMiddleware',
     # Custom middleware for serving admin static files in production
     'storynest.middleware.AdminStaticFilesMiddleware',
 ]
@@ -97,6 +99,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'site_config.context_processors.site_config',
+                'posts.context_processors.notifications',
             ],
         },
     },
@@ -169,6 +172,24 @@ MEDIA_ROOT = BASE_DIR / 'media'
 CRISPY_ALLOWED_TEMPLATE_PACKS = 'bootstrap5'
 CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
+# Presence tracking (seconds)
+PRESENCE_UPDATE_INTERVAL = 60  # At most one last-seen write per user per interval
+PRESENCE_TTL = 300  # Users seen within this window count as online
+
+# Home timelines. With fan-out on, new posts are written into each user's
+# timeline in the background; above the audience cap the feed is pulled instead.
+TIMELINE_FANOUT = False
+TIMELINE_MAX_ENTRIES = 500  # Newest entries kept per user
+TIMELINE_FANOUT_MAX_AUDIENCE = 10000  # Active users; beyond this use pull mode
+
+# Upcoming announcements sidebar. The default cache is per process, so other
+# workers may show a changed announcement this many seconds late.
+ANNOUNCEMENT_CACHE_TIMEOUT = 60
+
+# Live chat events for WebSockets. LocalBroker only reaches sockets served by
+# the same process; point this at a shared broker when running several.
+CHAT_BROKER = 'chat.hub.LocalBroker'
+
 # Login URLs
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'welcome'
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Profile, Kid
+from .models import Profile, Kid, UserStats
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -34,3 +34,10 @@ class KidAdmin(admin.ModelAdmin):
         queryset = super().get_queryset(request)
         # Add annotations for age calculation
         return queryset
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'post_count', 'likes_received', 'comments_written')
+    search_fields = ('user__username',)
+    readonly_fields = ('post_count', 'likes_received', 'comments_written')
+    list_select_related = ('user',)
@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from posts.models import BasePost, Comment
+from users.models import UserStats
+
+
+def count_subquery(queryset, field):
+    """Correlated COUNT of rows in queryset whose field points at the outer user"""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('user_id')}).order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user post, like and comment statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of users to rebuild per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        post_count = count_subquery(BasePost.objects.all(), 'author_id')
+        likes_received = count_subquery(BasePost.likes.through.objects.all(), 'basepost__author_id')
+        comments_written = count_subquery(Comment.objects.all(), 'author_id')
+
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+
+            UserStats.objects.bulk_create(
+                [UserStats(user_id=user_id) for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+            rebuilt += UserStats.objects.filter(user_id__in=user_ids).update(
+                post_count=post_count,
+                likes_received=likes_received,
+                comments_written=comments_written,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {rebuilt} users.'))
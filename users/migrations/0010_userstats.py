@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_stats(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserStats = apps.get_model('users', 'UserStats')
+    BasePost = apps.get_model('posts', 'BasePost')
+    Comment = apps.get_model('posts', 'Comment')
+    Like = BasePost.likes.through
+
+    def count(queryset, field):
+        rows = queryset.filter(**{field: OuterRef('user_id')}).order_by().values(field)
+        return Coalesce(Subquery(rows.annotate(total=Count('pk')).values('total')), 0)
+
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in User.objects.values_list('pk', flat=True)],
+        batch_size=500,
+    )
+    UserStats.objects.update(
+        post_count=count(BasePost.objects.all(), 'author_id'),
+        likes_received=count(Like.objects.all(), 'basepost__author_id'),
+        comments_written=count(Comment.objects.all(), 'author_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0009_presence'),
+        ('posts', '0011_basepost_like_count_basepost_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('likes_received', models.PositiveIntegerField(default=0)),
+                ('comments_written', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'user stats',
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
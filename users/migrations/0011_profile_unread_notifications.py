@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_unread(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    Notification = apps.get_model('posts', 'Notification')
+    unread = (
+        Notification.objects.filter(recipient_id=OuterRef('user_id'), is_read=False)
+        .order_by().values('recipient_id').annotate(total=Count('pk')).values('total')
+    )
+    Profile.objects.update(unread_notifications=Coalesce(Subquery(unread), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_userstats'),
+        ('posts', '0018_notification_groups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,8 @@
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from PIL import Image
 from django.templatetags.static import static
@@ -17,6 +21,12 @@ class Profile(models.Model):
     image = models.ImageField(upload_to='profile_pics', blank=True, null=True)
     bio = models.TextField(max_length=500, blank=True)
     user_type = models.CharField(max_length=10, choices=UserType.choices, default=UserType.PARENT)
+    # Unread notification groups, kept in step by the posts app
+    unread_notifications = models.PositiveIntegerField(default=0)
+    # Notifications last updated at or before this moment count as read
+    notifications_read_at = models.DateTimeField(null=True, blank=True)
+    # Written only by atomic updates, never by a full save
+    NOTIFICATION_STATE_FIELDS = ('unread_notifications', 'notifications_read_at')
     
     @property
     def image_url(self):
@@ -43,7 +53,30 @@ class Profile(models.Model):
     def __str__(self):
         return f'{self.user.username} Profile ({self.user_type})'
     
+    @classmethod
+    def bump_unread(cls, user_id, delta, *conditions):
+        """Atomically adjust a user's unread notification counter, if the profile matches conditions"""
+        cls.objects.filter(*conditions, user_id=user_id).update(
+            unread_notifications=Greatest(F('unread_notifications') + delta, 0)
+        )
+    
+    @staticmethod
+    def read_before(moment):
+        """Profiles whose read watermark is older than moment"""
+        return Q(notifications_read_at__isnull=True) | Q(notifications_read_at__lt=moment)
+    
+    @classmethod
+    def mark_notifications_read(cls, user_id):
+        """Move the read watermark to now; a single row write however many are unread"""
+        cls.objects.filter(user_id=user_id).update(notifications_read_at=timezone.now(), unread_notifications=0)
+    
     def save(self, *args, **kwargs):
+        # Never write back a stale copy of the notification state when editing a profile
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.NOTIFICATION_STATE_FIELDS
+            ]
         super().save(*args, **kwargs)
         
         # Resize profile image if it's too large
@@ -115,3 +148,48 @@ class Kid(models.Model):
                 img.save(self.profile_picture.path)
         except Exception as e:
             print(f"Error processing kid's profile picture: {e}")
+
+class Presence(models.Model):
+    """Last time a user was seen, written at most once per PRESENCE_UPDATE_INTERVAL"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='presence')
+    last_seen = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f'{self.user.username} last seen {self.last_seen}'
+    
+    @classmethod
+    def touch(cls, user_id):
+        """Record that a user is active right now"""
+        now = timezone.now()
+        if not cls.objects.filter(user_id=user_id).update(last_seen=now):
+            cls.objects.get_or_create(user_id=user_id, defaults={'last_seen': now})
+    
+    @classmethod
+    def online_cutoff(cls):
+        """Users seen after this moment count as online"""
+        return timezone.now() - timedelta(seconds=settings.PRESENCE_TTL)
+
+class UserStats(models.Model):
+    """Activity totals per user, kept up to date by the posts signals"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    post_count = models.PositiveIntegerField(default=0)
+    likes_received = models.PositiveIntegerField(default=0)
+    comments_written = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'user stats'
+    
+    def __str__(self):
+        return f'{self.user.username} stats'
+    
+    @classmethod
+    def bump(cls, user_id, **deltas):
+        """
+        Atomically add deltas to a user's counters, e.g. bump(5, post_count=1).
+        
+        Update only: the row is created with the user, and a missing row is
+        left to rebuild_user_stats. Creating it here would re-insert stats for
+        a user whose posts are being cascade-deleted along with them.
+        """
+        updates = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+        cls.objects.filter(user_id=user_id).update(**updates)
@@ -1,13 +1,23 @@
 from django.db.models.signals import post_save
 from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
 from django.dispatch import receiver
-from .models import Profile
+from .models import Profile, Presence, UserStats
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+        UserStats.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+@receiver(user_logged_out)
+def clear_presence(sender, request, user, **kwargs):
+    # Drop the user from the online list straight away
+    if user is not None:
+        Presence.objects.filter(user=user).delete()
+        cache.delete(f'presence:{user.pk}')
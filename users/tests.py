@@ -1,3 +1,94 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from posts.likes import toggle_like
+from posts.models import Comment, NormalPost
+from storynest.middleware import PresenceMiddleware
+from .models import Presence, Profile, UserStats
+
+
+@override_settings(PRESENCE_UPDATE_INTERVAL=60, PRESENCE_TTL=300)
+class PresenceTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', password='pw')
+        self.middleware = PresenceMiddleware(lambda request: HttpResponse())
+
+    def visit(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        self.middleware(request)
+
+    def test_writes_are_throttled_per_interval(self):
+        self.visit()
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Presence.objects.filter(user=self.user).update(last_seen=an_hour_ago)
+
+        self.visit()
+        self.assertEqual(Presence.objects.get(user=self.user).last_seen, an_hour_ago)
+
+        # Once the throttle key expires the next request writes again
+        cache.delete(f'presence:{self.user.pk}')
+        self.visit()
+        self.assertGreater(Presence.objects.get(user=self.user).last_seen, an_hour_ago)
+
+    def test_online_cutoff(self):
+        idle = User.objects.create_user('idle', password='pw')
+        Presence.touch(self.user.pk)
+        Presence.objects.create(user=idle, last_seen=timezone.now() - timedelta(seconds=301))
+
+        online = User.objects.filter(presence__last_seen__gte=Presence.online_cutoff())
+        self.assertEqual(list(online), [self.user])
+
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='pw')
+        self.reader = User.objects.create_user('reader', password='pw')
+
+    def test_delete_user_with_activity(self):
+        post = NormalPost.objects.create(title='Hello', content='World', author=self.author)
+        other_post = NormalPost.objects.create(title='Other', content='Post', author=self.reader)
+        Comment.objects.create(post=post, author=self.author, content='Own comment')
+        Comment.objects.create(post=other_post, author=self.author, content='Reply')
+        toggle_like(other_post.pk, self.author)
+        toggle_like(post.pk, self.reader)
+
+        self.author.delete()
+
+        self.assertFalse(User.objects.filter(username='author').exists())
+        self.assertFalse(UserStats.objects.filter(user_id=self.author.pk).exists())
+        stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(stats.post_count, 1)
+        # The author's like on the reader's post went with them
+        self.assertEqual(stats.likes_received, 0)
+        self.assertEqual(NormalPost.objects.get(pk=other_post.pk).like_count, 0)
+
+    def test_bump_does_not_create_missing_row(self):
+        UserStats.objects.filter(user=self.author).delete()
+        UserStats.bump(self.author.pk, post_count=1)
+        self.assertFalse(UserStats.objects.filter(user=self.author).exists())
+
+
+class ProfileSaveTests(TestCase):
+
+    def test_stale_edit_keeps_notification_state(self):
+        user = User.objects.create_user('reader', password='pw')
+        stale = Profile.objects.get(user=user)
+        Profile.bump_unread(user.pk, 3)
+        Profile.mark_notifications_read(user.pk)
+        read_at = Profile.objects.get(user=user).notifications_read_at
+
+        stale.bio = 'Edited from an old copy'
+        stale.save()
+
+        profile = Profile.objects.get(user=user)
+        self.assertEqual(profile.bio, 'Edited from an old copy')
+        self.assertEqual(profile.notifications_read_at, read_at)
+        self.assertEqual(profile.unread_notifications, 0)
@@ -5,7 +5,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm, KidForm
 from .models import Profile, Kid
-from posts.models import NormalPost, AnnouncementPost, CommunityPost
+from posts.models import BasePost
 
 def register(request):
     if request.method == 'POST':
@@ -94,17 +94,10 @@ def delete_kid(request, kid_id):
 
 def user_profile(request, username):
     """View for viewing other users' profiles"""
-    profile_user = get_object_or_404(User, username=username)
+    profile_user = get_object_or_404(User.objects.select_related('profile', 'stats'), username=username)
     
-    # Get user's posts
-    normal_posts = NormalPost.objects.filter(author=profile_user)
-    announcement_posts = AnnouncementPost.objects.filter(author=profile_user)
-    community_posts = CommunityPost.objects.filter(author=profile_user)
-    
-    # Combine and sort all posts
-    all_posts = list(normal_posts) + list(announcement_posts) + list(community_posts)
-    all_posts.sort(key=lambda x: x.created_at, reverse=True)
-    posts = all_posts[:5]
+    # Get user's five most recent posts of any type
+    posts = BasePost.objects.filter(author=profile_user)[:5]
     
     # Check if this is the current user's profile
     is_own_profile = request.user.is_authenticated and request.user == profile_user